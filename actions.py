@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import activity
 import color
 import exceptions
 
@@ -37,11 +38,17 @@ class WaitAction(Action):
 class TakeStairsAction(Action):
     def perform(self) -> None:
         """If stairs exist at the entity's location, use them."""
-        if(self.entity.x, self.entity.y) == self.engine.game_map.stairs_down_location:
-            self.engine.game_world.generate_floor()
+        location = self.entity.x, self.entity.y
+        if location == self.engine.game_map.stairs_down_location:
+            self.engine.game_world.descend()
             self.engine.message_log.add_message(
                 "You descend into the darkness...", color.descend
             )
+        elif location == self.engine.game_map.stairs_up_location:
+            self.engine.game_world.ascend()
+            self.engine.message_log.add_message(
+                "You climb back up the stairs.", color.descend
+            )
         else:
             raise exceptions.Impossible("There aren't any stairs to climb.")
 
@@ -80,6 +87,9 @@ class MeleeAction(ActionWithDirection):
 
         damage = self.entity.fighter.power - target.fighter.defense
 
+        # The sound of the fight wakes anything close enough to hear it.
+        self.engine.game_map.activity.make_noise(*self.dest_xy, activity.COMBAT_NOISE_RADIUS)
+
         attack_desc = f"{self.entity.name.capitalize()} attacks {target.name}"
         if self.entity is self.engine.player:
             attack_color = color.player_atk
@@ -187,16 +197,17 @@ class PickupAction(Action):
         actor_location_y = self.entity.y
         inventory = self.entity.inventory
 
-        for item in self.engine.game_map.items:
-            if actor_location_x == item.x and actor_location_y == item.y:
-                if len(inventory.items) >= inventory.capacity:
-                    raise exceptions.Impossible("Your inventory is full.")
+        items = self.engine.game_map.get_items_at_location(actor_location_x, actor_location_y)
+        if items:
+            item = items[0]
+            if len(inventory.items) >= inventory.capacity:
+                raise exceptions.Impossible("Your inventory is full.")
 
-                self.engine.game_map.entities.remove(item)
-                item.parent = self.entity.inventory
-                inventory.items.append(item)
+            self.engine.game_map.remove_entity(item)
+            item.parent = self.entity.inventory
+            inventory.items.append(item)
 
-                self.engine.message_log.add_message(f"You pick up a {item.name}.")
-                return
+            self.engine.message_log.add_message(f"You pick up a {item.name}.")
+            return
 
         raise exceptions.Impossible("You scramble on the floor, unable to find any items.")
\ No newline at end of file
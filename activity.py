@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Dict, List, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+if TYPE_CHECKING:
+    from entity import Actor
+    from game_map import GameMap
+
+# Monsters this close to the player wake up, seen or not.
+WAKE_RADIUS = 12
+# Awake monsters out of sight and beyond WAKE_RADIUS for this many turns fall asleep again.
+SLEEP_AFTER = 10
+# How far the sound of a fight carries.
+COMBAT_NOISE_RADIUS = 8
+
+
+class ActivityTracker:
+    """
+    Keeps track of which monsters on a map are awake.
+    Only awake monsters are on the map's TurnScheduler, everything else stays dormant until
+    the player comes near, sees it, or makes a noise it can hear.
+    """
+
+    def __init__(
+        self,
+        game_map: GameMap,
+        wake_radius: int = WAKE_RADIUS,
+        sleep_after: int = SLEEP_AFTER,
+    ):
+        self.game_map = game_map
+        self.wake_radius = wake_radius
+        self.sleep_after = sleep_after
+        # Awake actors and how many turns in a row each has spent away from the player.
+        self._idle_turns: Dict[Actor, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._idle_turns)
+
+    def is_awake(self, actor: Actor) -> bool:
+        return actor in self._idle_turns
+
+    def awake_actors(self) -> List[Actor]:
+        return list(self._idle_turns)
+
+    def wake(self, actor: Actor) -> None:
+        if actor not in self._idle_turns:
+            self.game_map.scheduler.schedule(actor)  # Newly woken actors act right away.
+        self._idle_turns[actor] = 0
+
+    def idle_turns(self, actor: Actor) -> int:
+        """Return how long an awake actor has been idle, or -1 if it's asleep."""
+        return self._idle_turns.get(actor, -1)
+
+    def restore(self, actor: Actor, idle_turns: int) -> None:
+        """Mark an actor awake without scheduling it, for loading saves which store the schedule."""
+        self._idle_turns[actor] = idle_turns
+
+    def sleep(self, actor: Actor) -> None:
+        self._idle_turns.pop(actor, None)
+        self.game_map.scheduler.unschedule(actor)
+
+    def make_noise(self, x: int, y: int, radius: int) -> None:
+        """Wake every living actor within `radius` of (x, y)."""
+        for actor in self.game_map.entity_table.actors_within(x, y, radius):
+            if actor is not self.game_map.engine.player:
+                self.wake(actor)
+
+    def update(self) -> None:
+        """Wake the monsters near or in view of the player, and put idle ones back to sleep."""
+        game_map = self.game_map
+        player = game_map.engine.player
+        table = game_map.entity_table
+
+        alerted = table.squared_distances(player.x, player.y) <= self.wake_radius * self.wake_radius
+        alerted[table.visible_rows(game_map.visible)] = True
+        alerted &= table.data["alive"]
+        alerted[table.row_of(player)] = False
+
+        for actor in table.entities_at_rows(np.flatnonzero(alerted)):
+            self.wake(actor)  # type: ignore
+        for actor, idle_turns in tuple(self._idle_turns.items()):
+            if alerted[table.row_of(actor)]:
+                continue
+            if idle_turns + 1 >= self.sleep_after:
+                self.sleep(actor)
+            else:
+                self._idle_turns[actor] = idle_turns + 1
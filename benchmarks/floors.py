@@ -0,0 +1,81 @@
+"""
+Walk down a world's floors and back up again, showing how GameWorld holds the floors left behind
+and what taking the stairs costs when the floor on the other side is new, hot or cold.
+"""
+from __future__ import annotations
+
+import statistics
+import time
+from typing import Callable, List, Optional
+
+import actions
+from engine import Engine
+import entity_assemblyline
+from game_map import GameWorld
+import savefile
+
+FLOORS = 20
+MAP_WIDTH, MAP_HEIGHT = 200, 200
+
+
+def new_world(hot_floors: Optional[int]) -> Engine:
+    engine = Engine(player=entity_assemblyline.player.clone())
+    engine.game_world = GameWorld(
+        engine=engine,
+        max_rooms=60,
+        room_min_size=6,
+        room_max_size=10,
+        map_width=MAP_WIDTH,
+        map_height=MAP_HEIGHT,
+        seed=1,
+        hot_floors=hot_floors,
+    )
+    engine.game_world.descend()
+    return engine
+
+
+def take_stairs(engine: Engine, location: Callable[[], object]) -> float:
+    """Take the stairs at `location`, returning how long the move took including the FOV update."""
+    player = engine.player
+    player.place(*location())  # type: ignore
+    start = time.perf_counter()
+    actions.TakeStairsAction(player).perform()
+    engine.update_fov()
+    return time.perf_counter() - start
+
+
+def median_ms(times: List[float]) -> str:
+    return f"{statistics.median(times) * 1000:>10.2f}" if times else f"{'-':>10}"
+
+
+def main() -> None:
+    print(
+        f"{MAP_WIDTH}x{MAP_HEIGHT} maps, down {FLOORS} floors and back up, median ms per move.\n"
+        f"{'hot floors':<12}{'new':>10}{'hot':>10}{'cold':>10}"
+        f"{'hot':>6}{'cold':>6}{'resident':>12}{'on disk':>12}"
+    )
+    for hot_floors in (0, 2, 8, FLOORS):
+        engine = new_world(hot_floors)
+        world = engine.game_world
+        down = [
+            take_stairs(engine, lambda: engine.game_map.stairs_down_location)
+            for _ in range(FLOORS - 1)
+        ]
+        savefile.get_save_pool().submit(lambda: None).result()  # Let the evictions land.
+        stats = world.floor_stats()
+
+        hot: List[float] = []
+        cold: List[float] = []
+        while world.current_floor > 1:
+            was_hot = any(floor == world.current_floor - 1 for floor, _ in world.floors.hot())
+            elapsed = take_stairs(engine, lambda: engine.game_map.stairs_up_location)
+            (hot if was_hot else cold).append(elapsed)
+
+        print(
+            f"{hot_floors:<12}{median_ms(down)}{median_ms(hot)}{median_ms(cold)}"
+            f"{stats.hot:>6}{stats.cold:>6}{stats.resident_bytes:>12,}{stats.cold_bytes:>12,}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Play turns against crowds of chasing monsters, showing how often their paths are replanned rather
+than reused, next to what a turn costs.  Compared against replanning every path every turn.
+"""
+from __future__ import annotations
+
+import time
+
+import actions
+from components import ai
+from engine import Engine
+import entity_assemblyline
+import exceptions
+from game_map import GameMap
+import tile_types
+
+# The room is as big as the player's flow field, so every monster can follow it.
+ROOM_SIZE = 65
+CROWDS = (30, 100, 300)
+TURNS = 100
+# The player walks in a square, so the crowd's paths go stale now and then.
+WALK = [(1, 0)] * 4 + [(0, 1)] * 4 + [(-1, 0)] * 4 + [(0, -1)] * 4
+
+
+def crowd(size: int) -> Engine:
+    """A lit room with the player in the middle and `size` orcs spread around them."""
+    engine = Engine(player=entity_assemblyline.player.clone())
+    game_map = GameMap(engine, ROOM_SIZE + 2, ROOM_SIZE + 2)
+    game_map.tiles[1:-1, 1:-1] = tile_types.floor
+    engine.game_map = game_map
+    engine.player.place(ROOM_SIZE // 2 + 1, ROOM_SIZE // 2 + 1, game_map)
+    step = max(1, ROOM_SIZE * ROOM_SIZE // size)
+    for i in range(size):
+        x, y = divmod(i * step % (ROOM_SIZE * ROOM_SIZE), ROOM_SIZE)
+        if not game_map.get_blocking_entity_at_location(x + 1, y + 1):
+            entity_assemblyline.orc.spawn(game_map, x + 1, y + 1)
+    engine.update_fov()
+    game_map.visible[:] = True  # Everyone sees the player, so everyone chases.
+    return engine
+
+
+def turn_time(size: int, max_path_age: int) -> float:
+    """Average seconds per turn, with paths replanned after at most `max_path_age` steps."""
+    engine = crowd(size)
+    player = engine.player
+    player.fighter.max_hp = player.fighter.hp = 10 ** 6
+    ai.MAX_PATH_AGE = max_path_age
+    ai.path_counters.reset()
+    start = time.perf_counter()
+    for turn in range(TURNS):
+        try:
+            actions.BumpAction(player, *WALK[turn % len(WALK)]).perform()
+        except exceptions.Impossible:
+            pass
+        engine.handle_enemy_turns()
+        engine.update_fov()
+        engine.game_map.visible[:] = True  # Keep the whole crowd chasing.
+    return (time.perf_counter() - start) / TURNS
+
+
+def main() -> None:
+    default_age = ai.MAX_PATH_AGE
+    print(
+        f"{TURNS} turns, average ms per turn.\n"
+        f"{'monsters':<10}{'paths':<10}{'ms/turn':>10}{'replans':>10}{'reuses':>10}"
+    )
+    for size in CROWDS:
+        for label, max_path_age in (("replan", 0), ("reuse", default_age)):
+            elapsed = turn_time(size, max_path_age)
+            counters = ai.path_counters
+            print(
+                f"{size:<10}{label:<10}{elapsed * 1000:>10.2f}"
+                f"{counters.replans:>10,}{counters.reuses:>10,}"
+            )
+    ai.MAX_PATH_AGE = default_age
+
+
+if __name__ == "__main__":
+    main()
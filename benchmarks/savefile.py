@@ -0,0 +1,149 @@
+"""
+Compare the savefile format against the old lzma-compressed pickle of the whole Engine.
+For a background save, the save time is only what it holds the game up for.
+"""
+from __future__ import annotations
+
+import copyreg
+import io
+import lzma
+import os
+import pickle
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import actions
+from engine import Engine
+import exceptions
+from floor_store import FloorStore
+from game_map import GameMap, GameWorld
+import savefile
+import setup_game
+
+TURNS = 300
+MESSAGES = 5_000
+
+
+def play(engine: Engine, turns: int, rng: random.Random) -> None:
+    """Wander at random, taking the stairs down every hundred turns."""
+    player = engine.player
+    for turn in range(turns):
+        dx, dy = rng.choice([(-1, 0), (1, 0), (0, 1), (0, -1), (1, 1), (-1, -1)])
+        try:
+            actions.BumpAction(player, dx, dy).perform()
+        except exceptions.Impossible:
+            continue
+        engine.handle_enemy_turns()
+        engine.update_fov()
+        if not player.is_alive:
+            player.fighter.hp = player.fighter.max_hp
+        if turn % 100 == 99:
+            player.place(*engine.game_map.stairs_down_location)
+            actions.TakeStairsAction(player).perform()
+            engine.update_fov()
+
+
+def restore_floor_store(
+    hot_floors: int, hot: List[Tuple[int, GameMap]], cold: Dict[int, bytes]
+) -> FloorStore:
+    floors = FloorStore(hot_floors)
+    for floor, blob in cold.items():
+        floors.add_blob(floor, blob)
+    for floor, game_map in hot:
+        floors.put(floor, game_map)
+    return floors
+
+
+def reduce_floor_store(floors: FloorStore) -> Tuple[Any, ...]:
+    # Cold floors are pickled as their blobs, which go back to disk when unpickled.
+    cold = {floor: floors.blob_reader(floor)() for floor in floors.cold()}
+    return restore_floor_store, (floors.hot_floors, list(floors.hot()), cold)
+
+
+def reduce_game_world(world: GameWorld) -> Tuple[Any, ...]:
+    # A floor still being built is thrown away, it's rebuilt from the seed when needed.
+    state = world.__dict__.copy()
+    state["_prefetched"] = None
+    return copyreg.__newobj__, (GameWorld,), state  # type: ignore[attr-defined]
+
+
+def pickle_save(engine: Engine, filename: str) -> None:
+    stream = io.BytesIO()
+    pickler = pickle.Pickler(stream)
+    pickler.dispatch_table = {
+        **copyreg.dispatch_table, FloorStore: reduce_floor_store, GameWorld: reduce_game_world
+    }
+    pickler.dump(engine)
+    with open(filename, "wb") as f:
+        f.write(lzma.compress(stream.getvalue()))
+
+
+def pickle_load(filename: str) -> Engine:
+    with open(filename, "rb") as f:
+        return pickle.loads(lzma.decompress(f.read()))
+
+
+def best_time(func: Callable[[], object], repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def background_save_time(engine: Engine, filename: str, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        save = savefile.save_in_background(engine, filename)
+        times.append(time.perf_counter() - start)
+        save.result()
+    return min(times)
+
+
+def measure(
+    engine: Engine,
+    save: Callable[[Engine, str], None],
+    load: Callable[[str], Engine],
+    filename: str,
+) -> Tuple[float, float, int]:
+    save_time = best_time(lambda: save(engine, filename))
+    load_time = best_time(lambda: load(filename))
+    return save_time, load_time, os.path.getsize(filename)
+
+
+def main() -> None:
+    random.seed(1)
+    fresh = setup_game.new_game()
+    played = setup_game.new_game()
+    play(played, TURNS, random.Random(2))
+    for i in range(MESSAGES):
+        played.message_log.add_message(f"The Orc attacks you for {i % 7} hit points.")
+    scenarios = {"new game": fresh, f"{TURNS} turns, {MESSAGES} messages": played}
+
+    print(f"{'scenario':<28}{'format':<14}{'save ms':>10}{'load ms':>10}{'bytes':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, engine in scenarios.items():
+            for format_name, save, load in (
+                ("lzma pickle", pickle_save, pickle_load),
+                ("savefile", savefile.save, savefile.load),
+            ):
+                save_time, load_time, size = measure(
+                    engine, save, load, os.path.join(directory, format_name)
+                )
+                print(
+                    f"{name:<28}{format_name:<14}{save_time * 1000:>10.2f}"
+                    f"{load_time * 1000:>10.2f}{size:>10,}"
+                )
+            save_time = background_save_time(engine, os.path.join(directory, "background"))
+            print(
+                f"{name:<28}{'background':<14}{save_time * 1000:>10.2f}"
+                f"{load_time * 1000:>10.2f}{size:>10,}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compare spawning entities from prototypes with Entity.clone against copy.deepcopy."""
+from __future__ import annotations
+
+import copy
+import timeit
+
+import entity_assemblyline
+from game_map import GameMap
+import tile_types
+
+PROTOTYPES = {
+    "player": entity_assemblyline.player,
+    "orc": entity_assemblyline.orc,
+    "troll": entity_assemblyline.troll,
+    "health potion": entity_assemblyline.health_potion,
+    "sword": entity_assemblyline.sword,
+}
+NUMBER = 20_000
+SPAWNS = 2_000
+
+
+def throughput(stmt, number: int) -> float:
+    """Best of three runs, in calls per second."""
+    return number / min(timeit.repeat(stmt, number=number, repeat=3))
+
+
+def spawn_rate(deep: bool) -> float:
+    """Orcs spawned per second onto an empty map, including the map's bookkeeping."""
+    def run() -> None:
+        gamemap = GameMap(None, 80, 43)  # type: ignore[arg-type]
+        gamemap.tiles[:, :] = tile_types.floor
+        for i in range(SPAWNS):
+            if deep:
+                orc = copy.deepcopy(entity_assemblyline.orc)
+                orc.x, orc.y, orc.parent = i % 80, i % 43, gamemap
+                gamemap.add_entity(orc)
+            else:
+                entity_assemblyline.orc.spawn(gamemap, i % 80, i % 43)
+    return SPAWNS / min(timeit.repeat(run, number=1, repeat=3))
+
+
+def main() -> None:
+    print(f"{'prototype':<16}{'deepcopy/s':>14}{'clone/s':>14}{'speedup':>10}")
+    for name, prototype in PROTOTYPES.items():
+        deep = throughput(lambda: copy.deepcopy(prototype), NUMBER)
+        fast = throughput(prototype.clone, NUMBER)
+        print(f"{name:<16}{deep:>14,.0f}{fast:>14,.0f}{fast / deep:>9.1f}x")
+    deep = spawn_rate(deep=True)
+    fast = spawn_rate(deep=False)
+    print(f"{'orc onto a map':<16}{deep:>14,.0f}{fast:>14,.0f}{fast / deep:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+ChunkKey = Tuple[int, int]
+
+
+class ChunkedArray:
+    """
+    A 2D array split into square chunks which are only allocated when first written to.
+    Chunks that were never written read back as `fill_value`.
+
+    Supports the indexing the map code relies on: `[x, y]`, `[x_slice, y_slice]`, `[xs, ys]`
+    with integer arrays, and `["field"]` for a structured dtype, which returns a ChunkedArray
+    viewing that field.  Anything else can use `np.asarray` to get a dense copy.
+    """
+
+    def __init__(
+        self,
+        shape: Tuple[int, int],
+        dtype: Any,
+        fill_value: Any,
+        chunk_size: int = 64,
+    ):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.fill_value = np.array(fill_value, dtype=self.dtype)
+        self.chunk_size = chunk_size
+        self._chunks: Dict[ChunkKey, np.ndarray] = {}
+        # Set on field views, which read and write the chunks of their base array.
+        self._base: Optional[ChunkedArray] = None
+        self._field: Optional[str] = None
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes held by allocated chunks."""
+        return sum(chunk.nbytes for chunk in self._chunks.values())
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self._chunks)
+
+    def chunk_keys(self) -> Iterator[ChunkKey]:
+        """Iterate over the keys of the allocated chunks."""
+        if self._base is not None:
+            return self._base.chunk_keys()
+        return iter(tuple(self._chunks))
+
+    def chunk_bounds(self, key: ChunkKey) -> Tuple[slice, slice]:
+        """Return the area of the array covered by a chunk, clipped to the array's shape."""
+        cx, cy = key
+        size = self.chunk_size
+        return (
+            slice(cx * size, min((cx + 1) * size, self.shape[0])),
+            slice(cy * size, min((cy + 1) * size, self.shape[1])),
+        )
+
+    def get_chunk(self, key: ChunkKey) -> Optional[np.ndarray]:
+        """Return the chunk at `key`, or None if it was never allocated."""
+        if self._base is not None:
+            chunk = self._base.get_chunk(key)
+            return None if chunk is None else chunk[self._field]
+        return self._chunks.get(key)
+
+    def set_chunk(self, key: ChunkKey, chunk: np.ndarray) -> None:
+        """Put a whole chunk in place at `key`.  The array is kept, not copied."""
+        assert self._base is None, "Set chunks on the base array, not a field view."
+        assert chunk.shape == (self.chunk_size, self.chunk_size) and chunk.dtype == self.dtype
+        self._chunks[key] = chunk
+
+    def _allocate_chunk(self, key: ChunkKey) -> np.ndarray:
+        if self._base is not None:
+            return self._base._allocate_chunk(key)[self._field]
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = np.full(
+                (self.chunk_size, self.chunk_size), self.fill_value, dtype=self.dtype, order="F"
+            )
+            self._chunks[key] = chunk
+        return chunk
+
+    def map_chunks(self, func: Callable[[np.ndarray], np.ndarray], dtype: Any) -> ChunkedArray:
+        """Return a new ChunkedArray of `func` applied to every allocated chunk and the fill value."""
+        out = ChunkedArray(self.shape, dtype, func(self.fill_value), self.chunk_size)
+        for key in self.chunk_keys():
+            out._chunks[key] = np.asfortranarray(func(self.get_chunk(key)))
+        return out
+
+    def _field_view(self, name: str) -> ChunkedArray:
+        view = ChunkedArray.__new__(ChunkedArray)
+        view.shape = self.shape
+        view.dtype = self.dtype[name]
+        view.fill_value = self.fill_value[name]
+        view.chunk_size = self.chunk_size
+        view._chunks = {}
+        view._base = self
+        view._field = name
+        return view
+
+    def _region(self, key: Any) -> Tuple[int, int, int, int, Tuple[int, ...]]:
+        """Convert an index into (x0, x1, y0, y1, result_shape)."""
+        if key is Ellipsis or isinstance(key, slice):
+            key = (key, slice(None))
+        if not isinstance(key, tuple) or len(key) != 2:
+            raise TypeError(f"ChunkedArray needs an (x, y) index, got {key!r}.")
+        bounds = []
+        result_shape = []
+        for index, length in zip(key, self.shape):
+            if index is Ellipsis:
+                index = slice(None)
+            if isinstance(index, slice):
+                start, stop, step = index.indices(length)
+                if step != 1:
+                    raise IndexError("ChunkedArray slices can't have a step.")
+                bounds.append((start, max(start, stop)))
+                result_shape.append(max(0, stop - start))
+            else:
+                index = int(index)
+                if index < 0:
+                    index += length
+                if not 0 <= index < length:
+                    raise IndexError(f"Index {index} is out of bounds for length {length}.")
+                bounds.append((index, index + 1))
+        (x0, x1), (y0, y1) = bounds
+        return x0, x1, y0, y1, tuple(result_shape)
+
+    def _overlapping_chunks(
+        self, x0: int, x1: int, y0: int, y1: int
+    ) -> Iterator[Tuple[ChunkKey, slice, slice, slice, slice]]:
+        """Yield each chunk key overlapping an area along with the local and chunk slices."""
+        size = self.chunk_size
+        for cx in range(x0 // size, (x1 - 1) // size + 1):
+            for cy in range(y0 // size, (y1 - 1) // size + 1):
+                ox0, ox1 = max(x0, cx * size), min(x1, (cx + 1) * size)
+                oy0, oy1 = max(y0, cy * size), min(y1, (cy + 1) * size)
+                yield (
+                    (cx, cy),
+                    slice(ox0 - x0, ox1 - x0),
+                    slice(oy0 - y0, oy1 - y0),
+                    slice(ox0 - cx * size, ox1 - cx * size),
+                    slice(oy0 - cy * size, oy1 - cy * size),
+                )
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, str):
+            return self._field_view(key)
+        if isinstance(key, tuple) and any(isinstance(index, np.ndarray) for index in key):
+            return self._get_points(*key)
+        x0, x1, y0, y1, result_shape = self._region(key)
+        out = np.full((x1 - x0, y1 - y0), self.fill_value, dtype=self.dtype, order="F")
+        if x1 > x0 and y1 > y0:
+            for chunk_key, out_x, out_y, chunk_x, chunk_y in self._overlapping_chunks(x0, x1, y0, y1):
+                chunk = self.get_chunk(chunk_key)
+                if chunk is not None:
+                    out[out_x, out_y] = chunk[chunk_x, chunk_y]
+        if not result_shape:
+            return out[0, 0]
+        return out.reshape(result_shape, order="F")
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        if isinstance(key, tuple) and any(isinstance(index, np.ndarray) for index in key):
+            return self._set_points(key[0], key[1], value)
+        x0, x1, y0, y1, result_shape = self._region(key)
+        if x1 <= x0 or y1 <= y0:
+            return
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), result_shape)
+        value = value.reshape((x1 - x0, y1 - y0))
+        for chunk_key, out_x, out_y, chunk_x, chunk_y in self._overlapping_chunks(x0, x1, y0, y1):
+            part = value[out_x, out_y]
+            chunk = self.get_chunk(chunk_key)
+            if chunk is None:
+                if (part == self.fill_value).all():
+                    continue  # Writing the fill value to an unallocated chunk changes nothing.
+                chunk = self._allocate_chunk(chunk_key)
+            chunk[chunk_x, chunk_y] = part
+
+    def _point_chunks(self, xs: np.ndarray, ys: np.ndarray) -> Iterator[Tuple[ChunkKey, np.ndarray]]:
+        """Group integer coordinate arrays by the chunk they fall in."""
+        size = self.chunk_size
+        chunk_x, chunk_y = xs // size, ys // size
+        flat = chunk_x * (self.shape[1] // size + 1) + chunk_y
+        for chunk_id in np.unique(flat).tolist():
+            mask = flat == chunk_id
+            index = np.flatnonzero(mask)[0]
+            yield (int(chunk_x.flat[index]), int(chunk_y.flat[index])), mask
+
+    def _get_points(self, xs: Any, ys: Any) -> np.ndarray:
+        xs, ys = np.broadcast_arrays(np.asarray(xs), np.asarray(ys))
+        out = np.full(xs.shape, self.fill_value, dtype=self.dtype)
+        size = self.chunk_size
+        for (cx, cy), mask in self._point_chunks(xs, ys):
+            chunk = self.get_chunk((cx, cy))
+            if chunk is not None:
+                out[mask] = chunk[xs[mask] - cx * size, ys[mask] - cy * size]
+        return out
+
+    def _set_points(self, xs: Any, ys: Any, value: Any) -> None:
+        xs, ys = np.broadcast_arrays(np.asarray(xs), np.asarray(ys))
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), xs.shape)
+        size = self.chunk_size
+        for (cx, cy), mask in self._point_chunks(xs, ys):
+            chunk = self.get_chunk((cx, cy))
+            if chunk is None:
+                if (value[mask] == self.fill_value).all():
+                    continue
+                chunk = self._allocate_chunk((cx, cy))
+            chunk[xs[mask] - cx * size, ys[mask] - cy * size] = value[mask]
+
+    def __ior__(self, other: Any) -> ChunkedArray:
+        if isinstance(other, ChunkedArray) and other.chunk_size == self.chunk_size:
+            # Only the allocated chunks of `other` can hold anything but its fill value.
+            assert not other.fill_value, "Only arrays filled with False can be merged by chunk."
+            for key in other.chunk_keys():
+                other_chunk = other.get_chunk(key)
+                if other_chunk is not None and other_chunk.any():
+                    chunk = self._allocate_chunk(key)
+                    chunk |= other_chunk
+        else:
+            self[:, :] = self[:, :] | np.asarray(other)
+        return self
+
+    def __array__(self, dtype: Any = None, copy: Any = None) -> np.ndarray:
+        dense = self[:, :]
+        if dtype is not None:
+            dense = dense.astype(dtype)
+        return dense
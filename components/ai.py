@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import random
-from typing import List, Optional, Tuple, TYPE_CHECKING
+from collections import deque
+from typing import Deque, List, Optional, Tuple, TYPE_CHECKING
 
 import numpy as np  # type: ignore
 import tcod
@@ -10,6 +11,10 @@ from actions import Action, BumpAction, MeleeAction, MovementAction, WaitAction
 
 if TYPE_CHECKING:
     from entity import Actor
+    from game_map import GameMap
+
+# A* searches this far around the box spanning both ends of a path, and no further.
+PATH_MARGIN = 32
 
 
 class BaseAI(Action):
@@ -18,33 +23,76 @@ class BaseAI(Action):
     def perform(self) -> None:
         raise NotImplementedError()
 
+    def plan(self) -> Action:
+        """Decide this turn's action without changing the map or the entities on it.
+        Every actor due at once plans before any of them acts, so this must only read the map
+        and entities.  AIs that can't plan without side effects return themselves and do their
+        work when performed.
+        """
+        return self
+
+    def clone(self, entity: Actor) -> BaseAI:
+        """Return a copy of this AI driving `entity`."""
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.entity = entity
+        return clone
+
     def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
         """Compute and return a path to the target position.
-        If there is no valid path then returns an empty list.
+        If there is no valid path within PATH_MARGIN of both ends then returns an empty list.
         """
-        # Copy the walkable array.
-        cost = np.array(self.entity.gamemap.tiles["walkable"], dtype=np.int8)
-
-        for entity in self.entity.gamemap.entities:
-            # Check that an enitiy blocks movement and the cost isn't zero (blocking.)
-            if entity.blocks_movement and cost[entity.x, entity.y]:
-                # Add to the cost of a blocked position.
-                # A lower number means more enemies will crowd behind each other in
-                # hallways.  A higher number means enemies will take longer paths in
-                # order to surround the player.
-                cost[entity.x, entity.y] += 10
+        game_map = self.entity.gamemap
+        x1 = max(0, min(self.entity.x, dest_x) - PATH_MARGIN)
+        y1 = max(0, min(self.entity.y, dest_y) - PATH_MARGIN)
+        x2 = min(game_map.width, max(self.entity.x, dest_x) + PATH_MARGIN + 1)
+        y2 = min(game_map.height, max(self.entity.y, dest_y) + PATH_MARGIN + 1)
+        cost = game_map.movement_cost(x1, y1, x2, y2)
 
         # Create a graph from the cost array and pass that graph to a new pathfinder.
         graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
         pathfinder = tcod.path.Pathfinder(graph)
 
-        pathfinder.add_root((self.entity.x, self.entity.y))  # Start position.
+        pathfinder.add_root((self.entity.x - x1, self.entity.y - y1))  # Start position.
 
         # Compute the path to the destination and remove the starting point.
-        path: List[List[int]] = pathfinder.path_to((dest_x, dest_y))[1:].tolist()
+        path: List[List[int]] = pathfinder.path_to((dest_x - x1, dest_y - y1))[1:].tolist()
+
+        # Convert from List[List[int]] to List[Tuple[int, int]] in map coordinates.
+        return [(index[0] + x1, index[1] + y1) for index in path]
+
 
-        # Convert from List[List[int]] to List[Tuple[int, int]].
-        return [(index[0], index[1]) for index in path]
+class FlowField:
+    """
+    Walking distances to a root tile, shared by every actor heading there.
+    Only the window within `radius` of the root is searched, to keep the cost bounded on large maps.
+    """
+
+    def __init__(self, game_map: GameMap, root: Tuple[int, int], radius: int):
+        root_x, root_y = root
+        self.x1, self.y1 = max(0, root_x - radius), max(0, root_y - radius)
+        x2 = min(game_map.width, root_x + radius + 1)
+        y2 = min(game_map.height, root_y + radius + 1)
+        window_cost = game_map.movement_cost(self.x1, self.y1, x2, y2)
+
+        self.distance = tcod.path.maxarray(window_cost.shape, dtype=np.int32)
+        self.distance[root_x - self.x1, root_y - self.y1] = 0
+        tcod.path.dijkstra2d(self.distance, window_cost, 2, 3)
+        self.unreachable = np.iinfo(np.int32).max
+
+    def path_from(self, x: int, y: int) -> List[Tuple[int, int]]:
+        """Return the path from (x, y) down to the root, not including (x, y).
+        If (x, y) is outside the window or can't reach the root then returns an empty list.
+        """
+        local_x, local_y = x - self.x1, y - self.y1
+        width, height = self.distance.shape
+        if not (0 <= local_x < width and 0 <= local_y < height):
+            return []
+        if self.distance[local_x, local_y] == self.unreachable:
+            return []
+
+        path = tcod.path.hillclimb2d(self.distance, (local_x, local_y), True, True)[1:].tolist()
+        return [(index[0] + self.x1, index[1] + self.y1) for index in path]
 
 
 class ConfusedEnemy(BaseAI):
@@ -59,6 +107,12 @@ class ConfusedEnemy(BaseAI):
         self.previous_ai = previous_ai
         self.turns_left = turns_left
 
+    def clone(self, entity: Actor) -> BaseAI:
+        clone = super().clone(entity)
+        if self.previous_ai:
+            clone.previous_ai = self.previous_ai.clone(entity)
+        return clone
+
     def perform(self) -> None:
         # Revert back to original state once turns_left equals zero.
         if self.turns_left <= 0:
@@ -84,12 +138,102 @@ class ConfusedEnemy(BaseAI):
         # Move/attack in that random direction. If the enemy hits a wall, the turn is wasted.
         return BumpAction(self.entity, direction_x, direction_y).perform()
 
+# A chasing path is kept until the target strays this many tiles from the end it was planned for.
+REPLAN_DISTANCE = 2
+# Paths followed or waited on for this many turns are replanned even if they still look valid.
+MAX_PATH_AGE = 12
+# The tiles next to an actor, in the order a way around a blocked step is looked for.
+SIDESTEPS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+class PathCounters:
+    """Running totals of how often hostile paths were planned versus reused."""
+
+    def __init__(self) -> None:
+        self.replans = 0
+        self.reuses = 0
+
+    def count(self, replanned: bool) -> None:
+        if replanned:
+            self.replans += 1
+        else:
+            self.reuses += 1
+
+    def reset(self) -> None:
+        self.replans = 0
+        self.reuses = 0
+
+    def __str__(self) -> str:
+        return f"paths replanned: {self.replans}, replans avoided: {self.reuses}"
+
+
+path_counters = PathCounters()
+
+
 class HostileEnemy(BaseAI):
     def __init__(self, entity: Actor):
         super().__init__(entity)
-        self.path: List[Tuple[int, int]] = []
+        self.path: Deque[Tuple[int, int]] = deque()
+        self.path_target: Optional[Tuple[int, int]] = None  # Where the target stood when planned.
+        self.path_age = 0
+        self.path_tiles_version = -1
 
-    def perform(self) -> None:
+    def clone(self, entity: Actor) -> BaseAI:
+        clone = super().clone(entity)
+        clone.path = deque(self.path)  # type: ignore[attr-defined]
+        return clone
+
+    def path_is_stale(self, target_x: int, target_y: int) -> bool:
+        """Return True if the current path can no longer be trusted to reach the target."""
+        if not self.path or self.path_target is None:
+            return True
+        if self.path_age >= MAX_PATH_AGE:
+            return True
+        planned_x, planned_y = self.path_target
+        if max(abs(target_x - planned_x), abs(target_y - planned_y)) > REPLAN_DISTANCE:
+            return True
+        game_map = self.entity.gamemap
+        if game_map.tiles.version != self.path_tiles_version:
+            return True  # The map was dug or rebuilt, tiles along the path may be gone.
+        next_x, next_y = self.path[0]
+        if max(abs(next_x - self.entity.x), abs(next_y - self.entity.y)) != 1:
+            return True  # Knocked off the path, for example while confused.
+        # Only terrain makes a step stale.  An actor in the way is stepped around or waited out.
+        return not game_map.tiles["walkable"][next_x, next_y]
+
+    def step_around(self) -> Optional[Tuple[int, int]]:
+        """Return a free tile next to this actor from which the path can go on, skipping its
+        blocked first step, or None if there isn't one.
+        """
+        if len(self.path) < 2:
+            return None
+        rejoin_x, rejoin_y = self.path[1]
+        game_map = self.entity.gamemap
+        walkable = game_map.tiles["walkable"]
+        for dx, dy in SIDESTEPS:
+            x, y = self.entity.x + dx, self.entity.y + dy
+            if (x, y) == self.path[0] or max(abs(rejoin_x - x), abs(rejoin_y - y)) != 1:
+                continue
+            if not game_map.in_bounds(x, y) or not walkable[x, y]:
+                continue
+            if game_map.get_blocking_entity_at_location(x, y) is None:
+                return x, y
+        return None
+
+    def plan_path(self, target_x: int, target_y: int) -> None:
+        target = self.engine.player
+        path: List[Tuple[int, int]] = []
+        if target_x == target.x and target_y == target.y:
+            # Chasing hostiles all walk down the same flow field toward the player.
+            path = self.engine.get_player_flow_field().path_from(self.entity.x, self.entity.y)
+        if not path:
+            path = self.get_path_to(target_x, target_y)
+        self.path = deque(path)
+        self.path_target = (target_x, target_y)
+        self.path_age = 0
+        self.path_tiles_version = self.entity.gamemap.tiles.version
+
+    def plan(self) -> Action:
         target = self.engine.player
         dx = target.x - self.entity.x
         dy = target.y - self.entity.y
@@ -97,14 +241,54 @@ class HostileEnemy(BaseAI):
 
         if self.engine.game_map.visible[self.entity.x, self.entity.y]:
             if distance <= 1:
-                return MeleeAction(self.entity, dx, dy).perform()
+                return MeleeAction(self.entity, dx, dy)
 
-            self.path = self.get_path_to(target.x, target.y)
+            replanned = self.path_is_stale(target.x, target.y)
+            if replanned:
+                self.plan_path(target.x, target.y)
+            path_counters.count(replanned)
 
         if self.path:
-            dest_x, dest_y = self.path.pop(0)
-            return MovementAction(
-                self.entity, dest_x - self.entity.x, dest_y - self.entity.y,
-            ).perform()
+            dest_x, dest_y = self.path[0]
+            if max(abs(dest_x - self.entity.x), abs(dest_y - self.entity.y)) != 1:
+                # An old path from before being knocked off it, it no longer starts here.
+                return WaitAction(self.entity)
+            if self.entity.gamemap.get_blocking_entity_at_location(dest_x, dest_y):
+                # Held up by another actor, which will likely have moved on soon.
+                sidestep = self.step_around()
+                if sidestep is None:
+                    return PathWaitAction(self)
+                dest_x, dest_y = sidestep
+            return PathStepAction(self, dest_x - self.entity.x, dest_y - self.entity.y)
+
+        return WaitAction(self.entity)
+
+    def perform(self) -> None:
+        return self.plan().perform()
 
-        return WaitAction(self.entity).perform()
\ No newline at end of file
+
+class PathStepAction(MovementAction):
+    """
+    Take the next step of a hostile's path, or a step around it onto the path further along.
+    The step is only used up once it's been taken.
+    """
+
+    def __init__(self, ai: HostileEnemy, dx: int, dy: int):
+        super().__init__(ai.entity, dx, dy)
+        self.ai = ai
+
+    def perform(self) -> None:
+        super().perform()
+        self.ai.path.popleft()
+        self.ai.path_age += 1
+
+
+class PathWaitAction(WaitAction):
+    """Wait for the way along a hostile's path to clear, ageing the path so it isn't waited on forever."""
+
+    def __init__(self, ai: HostileEnemy):
+        super().__init__(ai.entity)
+        self.ai = ai
+
+    def perform(self) -> None:
+        self.ai.path_age += 1
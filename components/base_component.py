@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TypeVar, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from engine import Engine
     from entity import Entity
     from game_map import GameMap
 
+C = TypeVar("C", bound="BaseComponent")
+
 
 class BaseComponent:
     parent: Entity  # Owning entity instance.
@@ -17,4 +19,13 @@ class BaseComponent:
 
     @property
     def engine(self) -> Engine:
-        return self.gamemap.engine
\ No newline at end of file
+        return self.gamemap.engine
+
+    def clone(self: C, parent: Entity) -> C:
+        """Return a copy of this component owned by `parent`.
+        Attributes are shared with the original, components holding mutable state copy it here.
+        """
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.parent = parent
+        return clone
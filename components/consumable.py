@@ -3,7 +3,10 @@ from math import dist
 
 from typing import Optional, TYPE_CHECKING
 
+import numpy as np  # type: ignore
+
 import actions
+import activity
 import color
 import components.inventory
 import components.ai
@@ -106,20 +109,20 @@ class FireballDamageConsumable(Consumable):
             raise Impossible("It's like my blind grandfather always said: you can't hit what you can't see. Then he started beating the crap out o- wait, I'm narrating a roguelike. You can't target that.")
 
         targets_hit = False
-        for actor in self.engine.game_map.actors:
-            if actor.distance(*target_xy) <= self.radius:
+        for actor in self.engine.game_map.entity_table.actors_within(*target_xy, self.radius):
+            self.engine.message_log.add_message(
+                f"The {actor.name} is engulfed in flame, dealing {self.damage} damage."
+            )
+            actor.fighter.take_damage(self.damage)
+            if actor.fighter.hp <= 0:
                 self.engine.message_log.add_message(
-                    f"The {actor.name} is engulfed in flame, dealing {self.damage} damage."
+                    f"The {actor.name} melts!"
                 )
-                actor.fighter.take_damage(self.damage)
-                if actor.fighter.hp <= 0:
-                    self.engine.message_log.add_message(
-                        f"The {actor.name} melts!"
-                    )
-                targets_hit = True
+            targets_hit = True
 
         if not targets_hit:
             raise Impossible("There are no targets in that radius.")
+        self.engine.game_map.activity.make_noise(*target_xy, activity.COMBAT_NOISE_RADIUS)
         self.consume()
 
 
@@ -131,15 +134,18 @@ class LightningDamageConsumable(Consumable):
     def activate(self, action: actions.ItemAction) -> None:
         consumer = action.entity
         target = None
-        closest_distance = self.maximum_range + 1.0
-
-        for actor in self.engine.game_map.actors:
-            if actor is not consumer and self.parent.gamemap.visible[actor.x, actor.y]:
-                distance = consumer.distance(actor.x, actor.y)
-
-                if distance < closest_distance:
-                    target = actor
-                    closest_distance = distance
+        table = self.engine.game_map.entity_table
+
+        # Living, visible actors other than the consumer, closest first.
+        candidate_rows = table.visible_rows(self.engine.game_map.visible)
+        candidate_rows = candidate_rows[
+            table.data["alive"][candidate_rows] & (candidate_rows != table.row_of(consumer))
+        ]
+        distances = np.sqrt(table.squared_distances(consumer.x, consumer.y)[candidate_rows])
+        in_range = distances < self.maximum_range + 1.0
+        if in_range.any():
+            candidate_rows = candidate_rows[in_range]
+            target = table.entity_at_row(candidate_rows[np.argmin(distances[in_range])])
 
         if target:
             self.engine.message_log.add_message(
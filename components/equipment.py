@@ -9,6 +9,10 @@ if TYPE_CHECKING:
     from entity import Actor, Item
 
 
+# The names of the equipment slots.
+SLOTS = ("weapon", "chest", "legs", "jewelry")
+
+
 class Equipment(BaseComponent):
     parent: Actor
 
@@ -24,6 +28,22 @@ class Equipment(BaseComponent):
         self.legs = legs
         self.jewelry = jewelry
 
+    def clone(self, parent: Actor) -> Equipment:  # type: ignore[override]
+        """Copy this equipment onto `parent`, whose inventory must already be cloned.
+        Equipped items are swapped for their copies in the new inventory.
+        """
+        clone = super().clone(parent)
+        items = self.parent.inventory.items
+        for slot in SLOTS:
+            item = getattr(self, slot)
+            if item is None:
+                continue
+            if item in items:
+                setattr(clone, slot, parent.inventory.items[items.index(item)])
+            else:
+                setattr(clone, slot, item.clone())
+        return clone
+
     @property
     def defense_bonus(self) -> int:
         bonus = 0
@@ -89,6 +109,7 @@ class Equipment(BaseComponent):
             self.unequip_from_slot(slot, add_message)
 
         setattr(self, slot, item)
+        self.parent.fighter.sync_stats()
 
         if add_message:
             self.equip_message(item.name)
@@ -100,6 +121,7 @@ class Equipment(BaseComponent):
             self.unequip_message(current_item.name)
         
         setattr(self, slot, None)
+        self.parent.fighter.sync_stats()
 
     def toggle_equip(self, equippable_item: Item, add_message: bool = True) -> None:
         if equippable_item.equippable:
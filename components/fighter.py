@@ -15,10 +15,15 @@ class Fighter(BaseComponent):
     parent: Actor
 
     def __init__(self, hp: int, base_defense: int, base_power: int):
-        self.max_hp = hp
+        self._max_hp = hp
         self._hp = hp
-        self.base_defense = base_defense
-        self.base_power = base_power
+        self._base_defense = base_defense
+        self._base_power = base_power
+
+    def sync_stats(self) -> None:
+        """Write this fighter's stats through to its row in the map's entity table."""
+        if hasattr(self.parent, "parent"):  # Prototypes aren't on a map.
+            self.gamemap.sync_entity(self.parent)
 
     @property
     def hp(self) -> int:
@@ -27,9 +32,37 @@ class Fighter(BaseComponent):
     @hp.setter
     def hp(self, value: int) -> None:
         self._hp = max(0, min(value, self.max_hp))
+        self.sync_stats()
         if self._hp == 0 and self.parent.ai:
             self.die()
 
+    @property
+    def max_hp(self) -> int:
+        return self._max_hp
+
+    @max_hp.setter
+    def max_hp(self, value: int) -> None:
+        self._max_hp = value
+        self.sync_stats()
+
+    @property
+    def base_defense(self) -> int:
+        return self._base_defense
+
+    @base_defense.setter
+    def base_defense(self, value: int) -> None:
+        self._base_defense = value
+        self.sync_stats()
+
+    @property
+    def base_power(self) -> int:
+        return self._base_power
+
+    @base_power.setter
+    def base_power(self, value: int) -> None:
+        self._base_power = value
+        self.sync_stats()
+
     @property
     def defense(self) -> int:
         return self.base_defense + self.defense_bonus
@@ -66,6 +99,7 @@ class Fighter(BaseComponent):
         self.parent.ai = None
         self.parent.name = f"remains of {self.parent.name}"
         self.parent.render_order = RenderOrder.CORPSE
+        self.gamemap.actor_died(self.parent)
 
         self.engine.message_log.add_message(death_message, death_message_color)
 
@@ -14,6 +14,13 @@ class Inventory(BaseComponent):
         self.capacity = capacity
         self.items: List[Item] = []
 
+    def clone(self, parent: Actor) -> Inventory:  # type: ignore[override]
+        clone = super().clone(parent)
+        clone.items = [item.clone() for item in self.items]
+        for item in clone.items:
+            item.parent = clone
+        return clone
+
     def drop(self, item: Item) -> None:
         """
         Removes an item from the inventory and puts it back on the game map at the player's current location.
@@ -1,19 +1,21 @@
 from __future__ import annotations
 
-import lzma
-import pickle
-from typing import TYPE_CHECKING
+from typing import List, Optional, Set, Tuple, TYPE_CHECKING
 
 from tcod.console import Console
-from tcod.map import compute_fov
 
+from actions import MovementAction
+from components.ai import FlowField
 import exceptions
+from game_map import FOV_RADIUS
 from message_log import MessageLog
 import render_functions
 
 if TYPE_CHECKING:
+    from actions import Action
     from entity import Actor
     from game_map import GameMap, GameWorld
+    from journal import Journal
 
 
 class Engine:
@@ -24,24 +26,76 @@ class Engine:
         self.message_log = MessageLog()
         self.mouse_location = (0,0)
         self.player = player
+        self.turn_count = 0
+        self._player_flow_field: Optional[FlowField] = None
+        # Records every turn once the game is being played, see journal.
+        self.journal: Optional[Journal] = None
+
+    def get_player_flow_field(self) -> FlowField:
+        """Return the flow field toward the player, computed at most once per enemy turn."""
+        if self._player_flow_field is None:
+            self._player_flow_field = FlowField(
+                self.game_map, (self.player.x, self.player.y), radius=32
+            )
+        return self._player_flow_field
 
     def handle_enemy_turns(self) -> None:
-        for entity in set(self.game_map.actors) - {self.player}:
-            if entity.ai:
-                try:
-                    entity.ai.perform()
-                except exceptions.Impossible:
-                    pass #Ignore all actions that can't complete from AI
+        """Let the world catch up with the time taken by the player's last action."""
+        self.turn_count += 1
+        self.game_map.activity.update()
+        self.advance_time(self.player.action_delay)
+
+    def advance_time(self, duration: int) -> None:
+        """Run every scheduled action due within `duration` time units, in time order.
+        Actors due at the same time are planned together against the current state, then
+        committed in order.  Nothing is done for the stretches where no one is due.
+        """
+        scheduler = self.game_map.scheduler
+        end_time = scheduler.time + duration
+        self._player_flow_field = None  # The player has acted since it was computed.
+        while True:
+            actors = [actor for actor in scheduler.pop_due(end_time) if actor.ai]
+            if not actors:
+                break
+
+            # Build the shared flow field up front, planning must only read it.
+            self.get_player_flow_field()
+
+            actions = [actor.ai.plan() for actor in actors]
+            self.commit_enemy_actions(actors, actions)
+
+            for actor in actors:
+                if self.game_map.activity.is_awake(actor):
+                    scheduler.schedule(actor, actor.action_delay)
+        scheduler.time = end_time
+
+    def commit_enemy_actions(self, actors: List[Actor], actions: List[Action]) -> None:
+        """Perform planned actions in map order, so a turn plays out the same way every time.
+        When several monsters planned to step onto the same tile the first one in order gets it
+        and the rest wait.
+        """
+        table = self.game_map.entity_table
+        order = sorted(
+            range(len(actors)),
+            key=lambda i: (actors[i].y, actors[i].x, table.row_of(actors[i])),
+        )
+        claimed: Set[Tuple[int, int]] = set()
+        for i in order:
+            if not actors[i].is_alive:
+                continue  # Killed earlier in this batch, its plan is void.
+            action = actions[i]
+            if isinstance(action, MovementAction):
+                if action.dest_xy in claimed:
+                    continue
+                claimed.add(action.dest_xy)
+            try:
+                action.perform()
+            except exceptions.Impossible:
+                pass #Ignore all actions that can't complete from AI
 
     def update_fov(self) -> None:
         """Recompute the visible area based on the players point of view."""
-        self.game_map.visible[:] = compute_fov(
-            self.game_map.tiles["transparent"],
-            (self.player.x, self.player.y),
-            radius=8,
-        )
-        # If a tile is "visible" it should be added to "explored".
-        self.game_map.explored |= self.game_map.visible
+        self.game_map.update_fov(self.player.x, self.player.y, radius=FOV_RADIUS)
 
     def render(self, console: Console) -> None:
         self.game_map.render(console)
@@ -58,9 +112,12 @@ class Engine:
         render_functions.render_names_at_mouse_location(console=console, x=21, y=44, engine=self)
 
         render_functions.render_dungeon_level(console=console, dungeon_level=self.game_world.current_floor,location=(0,47))
+
+        if self.journal is not None and self.journal.saving:
+            render_functions.render_save_indicator(console=console, location=(0, 49))
     
     def save_as(self, filename: str) -> None:
-        """Save this engine instance as a compressed file."""
-        save_data = lzma.compress(pickle.dumps(self))
-        with open(filename, "wb") as f:
-            f.write(save_data)
\ No newline at end of file
+        """Save this game to a file, in the format described in savefile."""
+        import savefile
+
+        savefile.save(self, filename)
\ No newline at end of file
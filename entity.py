@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import copy
 import math
 from typing import Optional, Tuple, Type, TypeVar, TYPE_CHECKING, Union
 
 from render_order import RenderOrder
+from scheduler import NORMAL_SPEED, action_delay
 
 if TYPE_CHECKING:
     from components.ai import BaseAI
@@ -44,34 +44,52 @@ class Entity:
         self.name = name
         self.blocks_movement = blocks_movement
         self.render_order = render_order
+        # The name of the entity_assemblyline prototype this entity was spawned from, if any.
+        self.template: Optional[str] = None
         if parent:
             # If parent isn't provided now then it will be set later.
             self.parent = parent
-            parent.entities.add(self)
+            parent.add_entity(self)
 
     @property
     def gamemap(self) -> GameMap:
         return self.parent.gamemap
 
+    def clone(self: T) -> T:
+        """Return a copy of this entity that isn't on any map.
+        Much cheaper than copy.deepcopy: the attributes are copied in one go and each component
+        copies only the state it knows to be mutable.
+        """
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.__dict__.pop("parent", None)
+        self._clone_components(clone)
+        return clone
+
+    def _clone_components(self, clone: T) -> None:
+        """Give `clone` its own copies of this entity's components."""
+
     def spawn(self: T, gamemap: GameMap, x: int, y: int) -> T:
         """Spawn a copy of this instance at the given location."""
-        clone = copy.deepcopy(self)
+        clone = self.clone()
         clone.x = x
         clone.y = y
         clone.parent = gamemap
-        gamemap.entities.add(clone)
+        gamemap.add_entity(clone)
         return clone
 
     def place(self, x: int, y: int, gamemap: Optional[GameMap] = None) -> None:
         """Place this entitiy at a new location.  Handles moving across GameMaps."""
-        self.x = x
-        self.y = y
         if gamemap:
             if hasattr(self, "parent"):  # Possibly uninitialized.
                 if self.parent is self.gamemap:
-                    self.gamemap.entities.remove(self)
+                    self.gamemap.remove_entity(self)
+            self.x = x
+            self.y = y
             self.parent = gamemap
-            gamemap.entities.add(self)
+            gamemap.add_entity(self)
+        else:
+            self._set_location(x, y)
 
     def distance(self, x: int, y: int) -> float:
         """
@@ -81,8 +99,15 @@ class Entity:
 
     def move(self, dx: int, dy: int) -> None:
         # Move the entity by a given amount
-        self.x += dx
-        self.y += dy
+        self._set_location(self.x + dx, self.y + dy)
+
+    def _set_location(self, x: int, y: int) -> None:
+        """Change this entity's location, keeping its map's location index current."""
+        old_x, old_y = self.x, self.y
+        self.x = x
+        self.y = y
+        if hasattr(self, "parent") and self.parent is self.gamemap:
+            self.gamemap.update_entity_location(self, old_x, old_y)
 
 
 class Actor(Entity):
@@ -99,6 +124,7 @@ class Actor(Entity):
         fighter: Fighter,
         inventory: Inventory,
         level: Level,
+        speed: int = NORMAL_SPEED,
     ):
         super().__init__(
             x=x,
@@ -124,11 +150,26 @@ class Actor(Entity):
         self.level = level
         self.level.parent = self
 
+        # How often this actor acts, NORMAL_SPEED acts once per player turn and double acts twice.
+        self.speed = speed
+
+    def _clone_components(self, clone: Actor) -> None:  # type: ignore[override]
+        clone.inventory = self.inventory.clone(clone)  # Before equipment, which holds its items.
+        clone.equipment = self.equipment.clone(clone)
+        clone.fighter = self.fighter.clone(clone)
+        clone.level = self.level.clone(clone)
+        clone.ai = self.ai.clone(clone) if self.ai else None
+
     @property
     def is_alive(self) -> bool:
         """Returns True as long as this actor can perform actions."""
         return bool(self.ai)
 
+    @property
+    def action_delay(self) -> int:
+        """The time this actor waits between actions."""
+        return action_delay(self.speed)
+
 
 class Item(Entity):
     def __init__(
@@ -158,4 +199,10 @@ class Item(Entity):
 
         self.equippable = equippable
         if self.equippable:
-            self.equippable.parent = self
\ No newline at end of file
+            self.equippable.parent = self
+
+    def _clone_components(self, clone: Item) -> None:  # type: ignore[override]
+        if self.consumable:
+            clone.consumable = self.consumable.clone(clone)
+        if self.equippable:
+            clone.equippable = self.equippable.clone(clone)
@@ -1,10 +1,12 @@
+from typing import Dict
+
 from components.ai import HostileEnemy
 from components import consumable, equippable
 from components.equipment import Equipment
 from components.fighter import Fighter
 from components.inventory import Inventory
 from components.level import Level
-from entity import Actor, Item
+from entity import Actor, Entity, Item
 
 
 #THE PLAYER
@@ -72,4 +74,13 @@ leather_legs=Item(char="+", color=(139, 69, 19), name="Leather Legs", equippable
 chain_chest=Item(char="[", color=(139, 69, 19), name="Chainmail Chestplate", equippable=equippable.ChainChest())
 chain_legs=Item(char="[", color=(139, 69, 19), name="Chainmail Skirt", equippable=equippable.ChainLegs())
 power_amulet=Item(char="*", color=(255, 255, 255), name="Amulet", equippable=equippable.PowerAmulet())
-health_ring=Item(char=".", color=(255, 0, 0), name="Ring", equippable=equippable.HealthRing())
\ No newline at end of file
+health_ring=Item(char=".", color=(255, 0, 0), name="Ring", equippable=equippable.HealthRing())
+
+#TEMPLATES
+# Every prototype above by name.  Spawned copies keep the name, so saves can store an entity as
+# its template plus whatever has changed since.
+templates: Dict[str, Entity] = {
+    name: prototype for name, prototype in list(globals().items()) if isinstance(prototype, Entity)
+}
+for name, prototype in templates.items():
+    prototype.template = name
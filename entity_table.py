@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+if TYPE_CHECKING:
+    from entity import Actor, Entity
+
+# One row per entity on a GameMap.  Columns are stored side by side so whole-map
+# passes (area damage, distances, render culling) become array operations.
+entity_dt = np.dtype(
+    [
+        ("x", np.int32),
+        ("y", np.int32),
+        ("hp", np.int32),
+        ("max_hp", np.int32),
+        ("power", np.int32),
+        ("defense", np.int32),
+        ("blocks_movement", bool),
+        ("render_order", np.int8),
+        ("ch", np.int32),  # Glyph codepoint, as in tile_types.graphic_dt.
+        ("fg", "3B"),
+        ("alive", bool),  # A living actor.
+        ("in_use", bool),  # False for rows on the free list.
+    ]
+)
+
+
+class EntityTable:
+    """
+    A struct-of-arrays copy of the entities on a GameMap.
+    The entity objects stay authoritative, every change to them is written through to their row.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.data = np.zeros(capacity, dtype=entity_dt)
+        self._entities: List[Optional[Entity]] = [None] * capacity
+        self._rows: Dict[Entity, int] = {}
+        self._free_rows = list(range(capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, entity: Entity) -> int:
+        """Give an entity a row and fill it in.  Returns the row index."""
+        if not self._free_rows:
+            self._grow()
+        row = self._free_rows.pop()
+        self._rows[entity] = row
+        self._entities[row] = entity
+        self.sync(entity)
+        return row
+
+    def remove(self, entity: Entity) -> None:
+        """Release the row of an entity that has left the map."""
+        row = self._rows.pop(entity)
+        self._entities[row] = None
+        self.data[row] = 0
+        self._free_rows.append(row)
+
+    def sync(self, entity: Entity) -> None:
+        """Copy every column from the entity object into its row."""
+        row = self._rows[entity]
+        fighter = getattr(entity, "fighter", None)
+        self.data[row] = (
+            entity.x,
+            entity.y,
+            fighter.hp if fighter else 0,
+            fighter.max_hp if fighter else 0,
+            fighter.power if fighter else 0,
+            fighter.defense if fighter else 0,
+            entity.blocks_movement,
+            entity.render_order.value,
+            ord(entity.char),
+            entity.color,
+            getattr(entity, "is_alive", False),
+            True,
+        )
+
+    def sync_location(self, entity: Entity) -> None:
+        """Copy only the position of an entity into its row."""
+        row = self._rows[entity]
+        self.data["x"][row] = entity.x
+        self.data["y"][row] = entity.y
+
+    def row_of(self, entity: Entity) -> int:
+        return self._rows[entity]
+
+    def entity_at_row(self, row: int) -> Entity:
+        entity = self._entities[row]
+        assert entity is not None, f"Row {row} is not in use."
+        return entity
+
+    def entities_at_rows(self, rows: np.ndarray) -> List[Entity]:
+        return [self.entity_at_row(row) for row in rows.tolist()]
+
+    def squared_distances(self, x: int, y: int) -> np.ndarray:
+        """Return the squared euclidean distance from every row to (x, y)."""
+        dx = self.data["x"] - x
+        dy = self.data["y"] - y
+        return dx * dx + dy * dy
+
+    def actors_within(self, x: int, y: int, radius: float) -> List[Actor]:
+        """Return the living actors no further than `radius` from (x, y)."""
+        in_range = self.data["alive"] & (self.squared_distances(x, y) <= radius * radius)
+        return self.entities_at_rows(np.flatnonzero(in_range))  # type: ignore
+
+    def visible_rows(self, visible: np.ndarray) -> np.ndarray:
+        """Return the indices of the rows standing on a visible tile."""
+        in_use = np.flatnonzero(self.data["in_use"])
+        xs = self.data["x"][in_use]
+        ys = self.data["y"][in_use]
+        return in_use[visible[xs, ys]]
+
+    def _grow(self) -> None:
+        old_capacity = len(self.data)
+        self.data = np.concatenate([self.data, np.zeros(old_capacity, dtype=entity_dt)])
+        self._entities.extend([None] * old_capacity)
+        self._free_rows.extend(range(2 * old_capacity - 1, old_capacity - 1, -1))
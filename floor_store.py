@@ -0,0 +1,127 @@
+"""
+Keeps the floors the player has left, so they can go back to them.
+
+The floors left most recently stay in memory as they are.  Beyond `hot_floors` of them the least
+recently left is evicted: snapshotted, then compressed and written to a temporary directory on
+savefile's save pool.  Taking a floor back reads it in again, so a cold floor costs disk space
+rather than memory.  Floors are only ever changed while they're the current one, so a floor's
+blob stays good for as long as it's stored.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import Future
+import os
+import tempfile
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+import savefile
+
+if TYPE_CHECKING:
+    from game_map import GameMap
+
+# Left floors kept in memory, besides the current one.
+HOT_FLOORS = 2
+
+
+class FloorStats:
+    """How the floors of a FloorStore are held."""
+
+    def __init__(self, hot: int, cold: int, resident_bytes: int, cold_bytes: int):
+        self.hot = hot
+        self.cold = cold
+        self.resident_bytes = resident_bytes  # Held by the arrays of the hot floors.
+        self.cold_bytes = cold_bytes  # The size on disk of the cold floors written so far.
+
+    def __str__(self) -> str:
+        return (
+            f"{self.hot} hot ({self.resident_bytes:,} bytes), "
+            f"{self.cold} cold ({self.cold_bytes:,} bytes on disk)"
+        )
+
+
+class FloorStore:
+    """The floors of a world other than the current one, by floor number."""
+
+    def __init__(self, hot_floors: int = HOT_FLOORS):
+        self.hot_floors = hot_floors
+        # Floor numbers to their maps, the least recently left first.
+        self._hot: OrderedDict[int, GameMap] = OrderedDict()
+        # Floor numbers to their blob's path, and the write of it which may still be in progress.
+        self._cold: Dict[int, Tuple[str, Future[None]]] = {}
+        self._directory: Optional[tempfile.TemporaryDirectory[str]] = None
+
+    def __contains__(self, floor: int) -> bool:
+        return floor in self._hot or floor in self._cold
+
+    def hot(self) -> Iterator[Tuple[int, GameMap]]:
+        yield from self._hot.items()
+
+    def cold(self) -> Iterator[int]:
+        yield from self._cold
+
+    def put(self, floor: int, game_map: GameMap) -> None:
+        """Store a floor the player has just left, evicting the least recently left if need be."""
+        self._hot[floor] = game_map
+        self._hot.move_to_end(floor)
+        while len(self._hot) > self.hot_floors:
+            self._evict(*self._hot.popitem(last=False))
+
+    def take(self, floor: int) -> GameMap:
+        """Remove a floor from the store and return it, reading it in if it's cold."""
+        if floor in self._hot:
+            return self._hot.pop(floor)
+        # The blob itself is left in place, saves queued before now may still read it.
+        blob = self.blob_reader(floor)()
+        del self._cold[floor]
+        return savefile.unpack_floor(blob)
+
+    def blob_reader(self, floor: int) -> Callable[[], bytes]:
+        """Return a function reading a cold floor's blob, once it's been written."""
+        path, write = self._cold[floor]
+
+        def read() -> bytes:
+            write.result()
+            with open(path, "rb") as f:
+                return f.read()
+
+        return read
+
+    def add_blob(self, floor: int, blob: bytes) -> None:
+        """Store a floor which is already packed, as from a save."""
+        self._hot.pop(floor, None)
+        path = self._path_of(floor)
+        self._cold[floor] = path, savefile.get_save_pool().submit(_write, path, blob)
+
+    def stats(self) -> FloorStats:
+        cold_bytes = 0
+        for path, write in self._cold.values():
+            if write.done() and os.path.exists(path):
+                cold_bytes += os.path.getsize(path)
+        return FloorStats(
+            hot=len(self._hot),
+            cold=len(self._cold),
+            resident_bytes=sum(game_map.nbytes for game_map in self._hot.values()),
+            cold_bytes=cold_bytes,
+        )
+
+    def _evict(self, floor: int, game_map: GameMap) -> None:
+        # Only the snapshot is taken here, it's packed and written on the save pool.
+        path = self._path_of(floor)
+        sections = savefile.snapshot_floor(game_map)
+        self._cold[floor] = path, savefile.get_save_pool().submit(_pack_and_write, path, sections)
+
+    def _path_of(self, floor: int) -> str:
+        if self._directory is None:
+            self._directory = tempfile.TemporaryDirectory(prefix="roguelike-floors-")
+        return os.path.join(self._directory.name, f"floor{floor}.bin")
+
+
+def _pack_and_write(path: str, sections: List[savefile.Section]) -> None:
+    _write(path, savefile.pack_floor(sections))
+
+
+def _write(path: str, blob: bytes) -> None:
+    # Scratch space, lost with the process anyway, so there's no need to sync it.
+    with open(path, "wb") as f:
+        f.write(blob)
@@ -1,114 +1,492 @@
 from __future__ import annotations
 
-from typing import Iterable, Iterator, Optional, TYPE_CHECKING, List
+from concurrent.futures import Future, ThreadPoolExecutor
+import random
+from typing import Dict, Iterable, Iterator, Optional, TYPE_CHECKING, List, Set, Tuple
 
 import numpy as np  # type: ignore
 from tcod.console import Console
+from tcod.map import compute_fov
 
+from activity import ActivityTracker
+from chunked_array import ChunkedArray
 from entity import Actor, Item
+from entity_table import EntityTable
+from render_order import RenderOrder
+from scheduler import TurnScheduler
 import tile_types
 
 if TYPE_CHECKING:
     from engine import Engine
     from entity import Entity
+    from floor_store import FloorStats
+    from procgen import FloorRecipe
+
+# How far the player can see.
+FOV_RADIUS = 8
+# The most of the screen the map is drawn in, from the top left.  The HUD is drawn below it.
+VIEW_WIDTH = 80
+VIEW_HEIGHT = 43
+
+# Builds upcoming floors in the background.
+_floor_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_floor_pool() -> ThreadPoolExecutor:
+    global _floor_pool
+    if _floor_pool is None:
+        _floor_pool = ThreadPoolExecutor(1, thread_name_prefix="floor-gen")
+    return _floor_pool
+
+
+# The chunk size of the movement cost cache on maps which aren't stored in chunks.
+MOVEMENT_COST_CHUNK_SIZE = 64
 
 
 class GameMap:
+    engine: Engine
+
     def __init__(
-        self, engine: Engine, width: int, height: int, entities: Iterable[Entity] = ()
+        self,
+        engine: Optional[Engine],
+        width: int,
+        height: int,
+        entities: Iterable[Entity] = (),
+        chunk_size: Optional[int] = None,
     ):
-        self.engine = engine
+        """
+        If `chunk_size` is given the map arrays are stored in chunks of that size,
+        which are only allocated once carved, so very large maps stay cheap.
+        Maps built ahead of time have no `engine` until they are entered.
+        """
+        self.engine = engine  # type: ignore
         self.width, self.height = width, height
-        self.entities = set(entities)
-        self.tiles = np.full((width, height), fill_value=tile_types.wall, order="F")
+        # The last rendered frame, the map tile at its top left, and the areas which have changed
+        # since, in map coordinates.
+        self._composited: Optional[np.ndarray] = None
+        self._view_origin = (0, 0)
+        self._dirty_areas: List[Tuple[int, int, int, int]] = []
+        # The viewpoint and tile version of the last FOV update, and the window it covered.
+        self._fov_key: Optional[Tuple[int, int, int, int]] = None
+        self._fov_area: Optional[Tuple[int, int, int, int]] = None
+        # The pathfinding costs, built a chunk at a time, and the tile version they were built from.
+        self._movement_cost: Optional[ChunkedArray] = None
+        self._movement_cost_version = -1
+        self.entities: Set[Entity] = set()
+        # Entities keyed by the tile they stand on, so location queries don't scan the map.
+        self._entities_by_location: Dict[Tuple[int, int], List[Entity]] = {}
+        # Typed registries, kept current on spawn, death, pickup and drop.
+        self._live_actors: Set[Actor] = set()
+        self._items: Set[Item] = set()
+        self._corpses: Set[Actor] = set()
+        self.entity_table = EntityTable()
+        # Entities spawned, moved, removed or changed since the journal last took them.
+        self.changed_entities: Set[Entity] = set()
+        # Entities grouped by render order, and the table rows of each group once looked up.
+        self._render_buckets: Dict[RenderOrder, Set[Entity]] = {order: set() for order in RenderOrder}
+        self._bucket_rows: Dict[RenderOrder, np.ndarray] = {}
+        # Monsters start out dormant and are only scheduled to take turns once woken.
+        self.scheduler = TurnScheduler()
+        self.activity = ActivityTracker(self)
+        for entity in entities:
+            self.add_entity(entity)
+
+        self.chunk_size = chunk_size
+        if chunk_size:
+            # Unallocated chunks read back as solid wall and unexplored.
+            self.tiles = tile_types.TileArray(
+                ChunkedArray((width, height), np.uint8, tile_types.wall, chunk_size)
+            )
+            self.visible = ChunkedArray((width, height), bool, False, chunk_size)
+            self.explored = ChunkedArray((width, height), bool, False, chunk_size)
+        else:
+            self.tiles = tile_types.TileArray(
+                np.full((width, height), fill_value=tile_types.wall, dtype=np.uint8, order="F")
+            )
 
-        self.visible = np.full(
-            (width, height), fill_value=False, order="F"
-        )  # Tiles the player can currently see
-        self.explored = np.full(
-            (width, height), fill_value=False, order="F"
-        )  # Tiles the player has seen before
+            self.visible = np.full(
+                (width, height), fill_value=False, order="F"
+            )  # Tiles the player can currently see
+            self.explored = np.full(
+                (width, height), fill_value=False, order="F"
+            )  # Tiles the player has seen before
 
         self.stairs_down_location = (0, 0)
+        # The stairs back to the floor above, on the entry tile of every floor but the first.
+        self.stairs_up_location: Optional[Tuple[int, int]] = None
+        # Where the player arrives on this floor.
+        self.entry_location = (0, 0)
 
     @property
     def gamemap(self) -> GameMap:
         return self
 
+    @property
+    def nbytes(self) -> int:
+        """The memory held by this map's arrays, entities aside."""
+        arrays = [self.visible, self.explored, self._composited, self._movement_cost]
+        return (
+            self.tiles.nbytes
+            + self.tiles.properties_nbytes
+            + sum(array.nbytes for array in arrays if array is not None)
+        )
+
+    def drop_caches(self) -> None:
+        """Free the rendered frame, movement costs and tile properties, they're rebuilt when needed."""
+        self._composited = None
+        self._dirty_areas = []
+        self.tiles.pop_dirty_areas()
+        self._movement_cost = None
+        self._movement_cost_version = -1
+        self.tiles.drop_properties()
+
     @property
     def actors(self) -> Iterator[Actor]:
         """Iterate over this maps living actors."""
-        yield from (
-            entity
-            for entity in self.entities
-            if isinstance(entity, Actor) and entity.is_alive
-        )
+        # Iterate over a snapshot, actors may die while the caller loops.
+        yield from tuple(self._live_actors)
 
     @property
     def items(self) ->Iterator[Item]:
-        yield from (entity for entity in self.entities if isinstance(entity, Item))
+        yield from tuple(self._items)
+
+    @property
+    def corpses(self) -> Iterator[Actor]:
+        """Iterate over the remains of this maps dead actors."""
+        yield from tuple(self._corpses)
+
+    def add_entity(self, entity: Entity) -> None:
+        """Add an entity to this map and index it by its current location."""
+        if entity in self.entities:
+            return
+        self.entities.add(entity)
+        self.changed_entities.add(entity)
+        self._entities_by_location.setdefault((entity.x, entity.y), []).append(entity)
+        self.mark_dirty(entity.x, entity.y)
+        self._update_movement_cost(entity.x, entity.y)
+        if isinstance(entity, Actor):
+            if entity.is_alive:
+                self._live_actors.add(entity)
+            else:
+                self._corpses.add(entity)
+        elif isinstance(entity, Item):
+            self._items.add(entity)
+        self.entity_table.add(entity)
+        self._rebucket(entity)
+
+    def remove_entity(self, entity: Entity) -> None:
+        """Remove an entity from this map and from the location index."""
+        self.entities.remove(entity)
+        self.changed_entities.add(entity)
+        self._unindex_entity(entity, entity.x, entity.y)
+        self.mark_dirty(entity.x, entity.y)
+        self._update_movement_cost(entity.x, entity.y)
+        self._live_actors.discard(entity)
+        self._items.discard(entity)
+        self._corpses.discard(entity)
+        self.activity.sleep(entity)  # type: ignore
+        self.entity_table.remove(entity)
+        self._rebucket(entity)
+
+    def actor_died(self, actor: Actor) -> None:
+        """Move a freshly killed actor from the living actors to the corpses."""
+        if actor in self._live_actors:
+            self._live_actors.remove(actor)
+            self._corpses.add(actor)
+        self.activity.sleep(actor)
+        self.sync_entity(actor)
+        self._rebucket(actor)
+        self.mark_dirty(actor.x, actor.y)
+        self._update_movement_cost(actor.x, actor.y)
+
+    def sync_entity(self, entity: Entity) -> None:
+        """Copy an entity's changed stats into the entity table."""
+        self.entity_table.sync(entity)
+        self.changed_entities.add(entity)
+
+    def _rebucket(self, entity: Entity) -> None:
+        """Put an entity in the render bucket of its current render order, if it's still on this map."""
+        for order, bucket in self._render_buckets.items():
+            if entity in bucket:
+                bucket.remove(entity)
+                self._bucket_rows.pop(order, None)
+        if entity in self.entities:
+            self._render_buckets[entity.render_order].add(entity)
+            self._bucket_rows.pop(entity.render_order, None)
+
+    def _rows_of_bucket(self, order: RenderOrder) -> np.ndarray:
+        if order not in self._bucket_rows:
+            self._bucket_rows[order] = np.fromiter(
+                (self.entity_table.row_of(entity) for entity in self._render_buckets[order]),
+                dtype=np.intp,
+            )
+        return self._bucket_rows[order]
+
+    def update_entity_location(self, entity: Entity, old_x: int, old_y: int) -> None:
+        """Move an entity in the location index after its x and y have changed."""
+        self._unindex_entity(entity, old_x, old_y)
+        self._entities_by_location.setdefault((entity.x, entity.y), []).append(entity)
+        self.entity_table.sync_location(entity)
+        self.changed_entities.add(entity)
+        self.mark_dirty(old_x, old_y)
+        self.mark_dirty(entity.x, entity.y)
+        self._update_movement_cost(old_x, old_y)
+        self._update_movement_cost(entity.x, entity.y)
+
+    def _unindex_entity(self, entity: Entity, x: int, y: int) -> None:
+        entities_here = self._entities_by_location[x, y]
+        entities_here.remove(entity)
+        if not entities_here:
+            del self._entities_by_location[x, y]
+
+    def get_entities_at_location(self, x: int, y: int) -> List[Entity]:
+        """Return every entity standing on the given tile."""
+        return self._entities_by_location.get((x, y), [])
 
     def get_blocking_entity_at_location(
         self, location_x: int, location_y: int,
     ) -> Optional[Entity]:
-        for entity in self.entities:
-            if (
-                entity.blocks_movement
-                and entity.x == location_x
-                and entity.y == location_y
-            ):
+        for entity in self.get_entities_at_location(location_x, location_y):
+            if entity.blocks_movement:
                 return entity
 
         return None
 
     def get_actor_at_location(self, x: int, y: int) -> Optional[Actor]:
-        for actor in self.actors:
-            if actor.x == x and actor.y == y:
-                return actor
+        for entity in self.get_entities_at_location(x, y):
+            if isinstance(entity, Actor) and entity.is_alive:
+                return entity
 
         return None
     
     def get_items_at_location(self, x: int, y: int) -> Optional[List[Item]]:
-        items = []
-        for item in self.engine.game_map.items:
-            if item.x == x and item.y == y:
-                items.append(item)
+        items = [
+            entity
+            for entity in self.get_entities_at_location(x, y)
+            if isinstance(entity, Item)
+        ]
 
         if len(items) > 0:
             return items
         return None
 
+    def movement_cost(self, x1: int, y1: int, x2: int, y2: int) -> np.ndarray:
+        """
+        Return the cost of walking onto each tile of the area [x1:x2, y1:y2] for pathfinding.
+        Impassable tiles cost 0.  The costs are cached by chunk, each chunk built the first time
+        an area covers it, so only the areas searched around actors are ever held.
+        The cache is dropped when the tiles change, and entity changes patch single tiles.
+        """
+        if self._movement_cost is None or self._movement_cost_version != self.tiles.version:
+            chunk_size = self.chunk_size or MOVEMENT_COST_CHUNK_SIZE
+            self._movement_cost = ChunkedArray(
+                (self.width, self.height), np.int8, 0, chunk_size
+            )
+            self._movement_cost_version = self.tiles.version
+        cost = self._movement_cost
+        chunk_size = cost.chunk_size
+        for cx in range(x1 // chunk_size, (x2 - 1) // chunk_size + 1):
+            for cy in range(y1 // chunk_size, (y2 - 1) // chunk_size + 1):
+                if cost.get_chunk((cx, cy)) is None:
+                    cost.set_chunk((cx, cy), self._build_movement_cost((cx, cy)))
+        return cost[x1:x2, y1:y2]
+
+    def _build_movement_cost(self, key: Tuple[int, int]) -> np.ndarray:
+        """Return the movement costs of one chunk of the cost cache."""
+        assert self._movement_cost is not None
+        chunk_size = self._movement_cost.chunk_size
+        xs, ys = self._movement_cost.chunk_bounds(key)
+        walkable = np.zeros((chunk_size, chunk_size), dtype=bool, order="F")
+        walkable[: xs.stop - xs.start, : ys.stop - ys.start] = self.tiles["walkable"][xs, ys]
+
+        data = self.entity_table.data
+        x, y = data["x"], data["y"]
+        blocking = (
+            data["in_use"] & data["blocks_movement"]
+            & (xs.start <= x) & (x < xs.stop) & (ys.start <= y) & (y < ys.stop)
+        )
+        blockers = np.zeros((chunk_size, chunk_size), dtype=np.int8, order="F")
+        np.add.at(blockers, (x[blocking] - xs.start, y[blocking] - ys.start), 1)
+        # Add to the cost of a blocked position.
+        # A lower number means more enemies will crowd behind each other in
+        # hallways.  A higher number means enemies will take longer paths in
+        # order to surround the player.
+        return np.where(walkable, 1 + 10 * blockers, 0).astype(np.int8, order="F")
+
+    def _update_movement_cost(self, x: int, y: int) -> None:
+        """Recompute the cached movement cost of one tile after the entities on it changed."""
+        cost = self._movement_cost
+        if cost is None or cost.get_chunk((x // cost.chunk_size, y // cost.chunk_size)) is None:
+            return  # The tile's chunk is built with the entities on it when it's next needed.
+        if not self.tiles["walkable"][x, y]:
+            return
+        blocking = sum(entity.blocks_movement for entity in self.get_entities_at_location(x, y))
+        cost[x, y] = 1 + 10 * blocking
+
     def in_bounds(self, x: int, y: int) -> bool:
         """Return True if x and y are inside of the bounds of this map."""
         return 0 <= x < self.width and 0 <= y < self.height
 
+    def mark_dirty(self, x: int, y: int, width: int = 1, height: int = 1) -> None:
+        """Mark an area of the map to be redrawn on the next render."""
+        if self._composited is None:
+            return  # Nothing's been drawn yet, the first render draws everything.
+        self._dirty_areas.append((x, y, x + width, y + height))
+
+    @property
+    def fov_key(self) -> Optional[Tuple[int, int, int, int]]:
+        """The viewpoint, radius and tile version of the last FOV update, None if there wasn't one."""
+        return self._fov_key
+
+    @property
+    def fov_area(self) -> Optional[Tuple[int, int, int, int]]:
+        """The window (x1, y1, x2, y2) the last FOV update covered, None if there wasn't one."""
+        return self._fov_area
+
+    def reset_fov(self) -> None:
+        """Clear what's visible, so the next FOV update is worked out afresh."""
+        if self._fov_area:
+            x1, y1, x2, y2 = self._fov_area
+            self.visible[x1:x2, y1:y2] = False
+            self.mark_dirty(x1, y1, x2 - x1, y2 - y1)
+        self._fov_key = None
+        self._fov_area = None
+
+    def update_fov(self, x: int, y: int, radius: int) -> None:
+        """
+        Recompute the tiles visible from (x, y), adding them to the explored tiles.
+        Skipped when neither the viewpoint nor the tiles have changed since the last call.
+        Only the window within `radius` of the viewpoint is computed, nothing outside it can be seen.
+        """
+        fov_key = (x, y, radius, self.tiles.version)
+        if fov_key == self._fov_key:
+            return
+        self.reset_fov()  # Clear what was visible from the last viewpoint.
+        self._fov_key = fov_key
+
+        x1, y1 = max(0, x - radius), max(0, y - radius)
+        x2, y2 = min(self.width, x + radius + 1), min(self.height, y + radius + 1)
+        window = slice(x1, x2), slice(y1, y2)
+        visible = compute_fov(
+            self.tiles["transparent"][window], (x - x1, y - y1), radius=radius,
+        )
+        self.visible[window] = visible
+        # If a tile is "visible" it should be added to "explored".
+        self.explored[window] = self.explored[window] | visible
+        self._fov_area = x1, y1, x2, y2
+        self.mark_dirty(x1, y1, x2 - x1, y2 - y1)
+
+    @property
+    def view_area(self) -> Tuple[int, int, int, int]:
+        """The (x1, y1, x2, y2) area of the map the last render drew on the screen."""
+        width, height = self._composited.shape if self._composited is not None else (0, 0)
+        x1, y1 = self._view_origin
+        return x1, y1, x1 + width, y1 + height
+
+    def screen_to_map(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """Return the map tile drawn at (x, y) on the screen, or None if the map isn't drawn there."""
+        x1, y1, x2, y2 = self.view_area
+        if not (0 <= x < x2 - x1 and 0 <= y < y2 - y1):
+            return None
+        return x + x1, y + y1
+
+    def map_to_screen(self, x: int, y: int) -> Tuple[int, int]:
+        """Return where on the screen the map tile (x, y) is drawn, which may be off it."""
+        return x - self._view_origin[0], y - self._view_origin[1]
+
+    def camera_origin(self, view_width: int, view_height: int) -> Tuple[int, int]:
+        """Return the top left of a view centred on the player, without going past the map's edges."""
+        player = self.engine.player
+        x = min(max(player.x - view_width // 2, 0), self.width - view_width)
+        y = min(max(player.y - view_height // 2, 0), self.height - view_height)
+        return x, y
+
     def render(self, console: Console) -> None:
         """
         Renders the map.
         If a tile is in the "visible" array, then draw it with the "seen" colors.
         If it isn't, but it's in the "explored" array, then draw it with the "unseen" colors.
         Otherwise, the default is "FOW".
+
+        Maps bigger than the view are drawn through a camera following the player.  The drawn view
+        is kept between frames and only the areas marked dirty by FOV changes, tile edits and
+        entity changes are redrawn, along with whatever scrolls into view.
         """
-        console.tiles_rgb[0 : self.width, 0 : self.height] = np.select(
-            condlist=[self.visible, self.explored],
-            choicelist=[self.tiles["seen"], self.tiles["unseen"]],
-            default=tile_types.FOW,
+        width = min(self.width, VIEW_WIDTH, console.width)
+        height = min(self.height, VIEW_HEIGHT, console.height)
+        origin_x, origin_y = self.camera_origin(width, height)
+        if self._composited is None or self._composited.shape != (width, height):
+            self._composited = np.empty((width, height), dtype=tile_types.graphic_dt, order="F")
+            self._dirty_areas = [(origin_x, origin_y, origin_x + width, origin_y + height)]
+        elif (origin_x, origin_y) != self._view_origin:
+            self._scroll(origin_x, origin_y)
+        self._view_origin = origin_x, origin_y
+        self._dirty_areas.extend(self.tiles.pop_dirty_areas())
+
+        for x1, y1, x2, y2 in self._dirty_areas:
+            x1, y1 = max(x1, origin_x), max(y1, origin_y)
+            x2, y2 = min(x2, origin_x + width), min(y2, origin_y + height)
+            if x1 < x2 and y1 < y2:
+                self._composite(x1, y1, x2, y2)
+        self._dirty_areas.clear()
+
+        console.tiles_rgb[0:width, 0:height] = self._composited
+
+    def _scroll(self, origin_x: int, origin_y: int) -> None:
+        """Move the drawn view to a new origin, keeping the part still in view."""
+        assert self._composited is not None
+        width, height = self._composited.shape
+        old_x, old_y = self._view_origin
+        # The map area in both the old and the new view.
+        x1, y1 = max(origin_x, old_x), max(origin_y, old_y)
+        x2, y2 = min(origin_x, old_x) + width, min(origin_y, old_y) + height
+        if x1 >= x2 or y1 >= y2:
+            self._dirty_areas.append((origin_x, origin_y, origin_x + width, origin_y + height))
+            return
+        self._composited[x1 - origin_x:x2 - origin_x, y1 - origin_y:y2 - origin_y] = (
+            self._composited[x1 - old_x:x2 - old_x, y1 - old_y:y2 - old_y].copy()
         )
+        # Everything else in the new view is drawn afresh.
+        self._dirty_areas += [
+            (origin_x, origin_y, x1, origin_y + height),
+            (x2, origin_y, origin_x + width, origin_y + height),
+            (x1, origin_y, x2, y1),
+            (x1, y2, x2, origin_y + height),
+        ]
+
+    def _composite(self, x1: int, y1: int, x2: int, y2: int) -> None:
+        """Redraw the tiles and entities of a map area in view into the drawn view."""
+        assert self._composited is not None
+        area = slice(x1, x2), slice(y1, y2)
+        origin_x, origin_y = self._view_origin
+        frame = self._composited[x1 - origin_x:x2 - origin_x, y1 - origin_y:y2 - origin_y]
+        tile_ids = self.tiles[area]
 
-        entities_sorted_for_rendering = sorted(
-            self.entities, key=lambda x: x.render_order.value
+        frame[:] = np.select(
+            condlist=[self.visible[area], self.explored[area]],
+            choicelist=[tile_types.palette["seen"][tile_ids], tile_types.palette["unseen"][tile_ids]],
+            default=tile_types.FOW,
         )
 
-        for entity in entities_sorted_for_rendering:
-            if self.visible[entity.x, entity.y]:
-                console.print(
-                    x=entity.x, y=entity.y, string=entity.char, fg=entity.color
-                )
+        # Draw each render order bucket from the lowest up, culled to the visible tiles of the area.
+        table = self.entity_table.data
+        for order in RenderOrder:
+            rows = self._rows_of_bucket(order)
+            xs, ys = table["x"][rows], table["y"][rows]
+            in_area = (xs >= x1) & (xs < x2) & (ys >= y1) & (ys < y2)
+            rows, xs, ys = rows[in_area], xs[in_area], ys[in_area]
+            shown = self.visible[xs, ys]
+            frame["ch"][xs[shown] - x1, ys[shown] - y1] = table["ch"][rows[shown]]
+            frame["fg"][xs[shown] - x1, ys[shown] - y1] = table["fg"][rows[shown]]
 
 
 class GameWorld:
     """
-    Holds the settings for the GameMap, and generates new maps when moving down the stairs.
+    Holds the settings for the GameMap, and moves the player between floors by the stairs.
+    The floor below the current one is built in the background, so taking the stairs doesn't wait
+    on it.  Each floor is built from a FloorRecipe of the world seed and the floor number, so its
+    tiles aren't saved, only the changes made to them since.  Floors the player has left are kept
+    in `floors`, the `hot_floors` most recently left in memory, see floor_store.
     """
 
     def __init__(
@@ -120,8 +498,14 @@ class GameWorld:
         max_rooms: int,
         room_min_size: int,
         room_max_size: int,
-        current_floor: int = 0
+        current_floor: int = 0,
+        chunk_size: Optional[int] = None,
+        seed: Optional[int] = None,
+        hot_floors: Optional[int] = None,
     ):
+        # Imported here, as floor_store imports savefile which imports this module.
+        from floor_store import FloorStore, HOT_FLOORS
+
         self.engine = engine
 
         self.map_width = map_width
@@ -134,16 +518,85 @@ class GameWorld:
 
         self.current_floor = current_floor
 
-    def generate_floor(self) -> None:
-        from procgen import generate_dungeon
+        self.chunk_size = chunk_size
+
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+
+        self.floors: FloorStore = FloorStore(HOT_FLOORS if hot_floors is None else hot_floors)
+
+        # The floor being built ahead of time, and its number.
+        self._prefetched: Optional[Future[GameMap]] = None
+        self._prefetched_floor = 0
 
-        self.current_floor += 1
+    def recipe_for(self, floor: int) -> FloorRecipe:
+        """Return the recipe for a floor of this world."""
+        from procgen import FloorRecipe
 
-        self.engine.game_map = generate_dungeon(
+        return FloorRecipe(
+            seed=self.seed,
+            floor_number=floor,
+            map_width=self.map_width,
+            map_height=self.map_height,
             max_rooms=self.max_rooms,
             room_min_size=self.room_min_size,
             room_max_size=self.room_max_size,
-            map_width=self.map_width,
-            map_height=self.map_height,
-            engine=self.engine,
-        )
\ No newline at end of file
+            chunk_size=self.chunk_size,
+        )
+
+    def build_floor(self, floor: int) -> GameMap:
+        """Build a floor without touching the engine, which is safe to do on another thread."""
+        game_map = self.recipe_for(floor).build()
+        game_map.tiles.pop_dirty_areas()  # Carving it needn't be redrawn, it's drawn whole at first.
+        # The player's first view of the floor, from where they'll arrive.
+        game_map.update_fov(*game_map.entry_location, radius=FOV_RADIUS)
+        return game_map
+
+    def prefetch_floor(self, floor: int) -> None:
+        """Start building `floor` in the background, unless it already is or was visited."""
+        if floor in self.floors:
+            return
+        if self._prefetched is None or self._prefetched_floor != floor:
+            self._prefetched = get_floor_pool().submit(self.build_floor, floor)
+            self._prefetched_floor = floor
+
+    def descend(self) -> None:
+        self.change_floor(self.current_floor + 1)
+
+    def ascend(self) -> None:
+        self.change_floor(self.current_floor - 1)
+
+    def change_floor(self, floor: int) -> None:
+        """
+        Move the player to `floor`, onto the stairs leading back to the floor they left.
+        A floor visited before is taken back from `floors`, any other is built.
+        """
+        going_down = floor > self.current_floor
+        if floor in self.floors:
+            game_map = self.floors.take(floor)
+        elif self._prefetched is not None and self._prefetched_floor == floor:
+            game_map = self._prefetched.result()  # Usually done by now.
+        else:
+            game_map = self.build_floor(floor)
+        self._prefetched = None
+
+        left_floor, self.current_floor = self.current_floor, floor
+        game_map.engine = self.engine
+        if going_down:
+            self.engine.player.place(*game_map.entry_location, game_map)
+        else:
+            self.engine.player.place(*game_map.stairs_down_location, game_map)
+        if left_floor:
+            self.engine.game_map.drop_caches()
+            self.floors.put(left_floor, self.engine.game_map)
+        self.engine.game_map = game_map
+
+        self.prefetch_floor(floor + 1)
+
+    def floor_stats(self) -> FloorStats:
+        """How the floors are held, the current one counted as hot."""
+        stats = self.floors.stats()
+        stats.hot += 1
+        stats.resident_bytes += self.engine.game_map.nbytes
+        return stats
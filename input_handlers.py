@@ -141,11 +141,14 @@ class EventHandler(BaseEventHandler):
         self.engine.handle_enemy_turns()
 
         self.engine.update_fov()
+        if self.engine.journal:
+            self.engine.journal.record_turn()
         return True
 
     def ev_mousemotion(self, event: tcod.event.MouseMotion) -> None:
-        if self.engine.game_map.in_bounds(event.tile.x, event.tile.y):
-            self.engine.mouse_location = event.tile.x, event.tile.y
+        location = self.engine.game_map.screen_to_map(event.tile.x, event.tile.y)
+        if location is not None:
+            self.engine.mouse_location = location
 
     def on_render(self, console: tcod.Console) -> None:
         self.engine.render(console)
@@ -390,7 +393,7 @@ class SelectIndexHandler(AskUserEventHandler):
 
     def on_render(self, console: tcod.Console) -> None:
         super().on_render(console)
-        x, y = self.engine.mouse_location
+        x, y = self.engine.game_map.map_to_screen(*self.engine.mouse_location)
         console.tiles_rgb["bg"][x, y] = color.white
         console.tiles_rgb["fg"][x, y] = color.black
 
@@ -410,9 +413,10 @@ class SelectIndexHandler(AskUserEventHandler):
             dx, dy = MOVE_KEYS[key]
             x += dx * modifier
             y += dy * modifier
-            # Prevent the cursor from leaving the map.
-            x = max(0, min(x, self.engine.game_map.width - 1))
-            y = max(0, min(y, self.engine.game_map.height - 1))
+            # Prevent the cursor from leaving the part of the map on screen.
+            x1, y1, x2, y2 = self.engine.game_map.view_area
+            x = max(x1, min(x, x2 - 1))
+            y = max(y1, min(y, y2 - 1))
             self.engine.mouse_location = x, y
             return None
         elif key in CONFIRM_KEYS:
@@ -421,9 +425,10 @@ class SelectIndexHandler(AskUserEventHandler):
 
     def ev_mousebuttondown(self, event: tcod.event.MouseButtonDown) -> Optional[ActionOrHandler]:
         """Left click confirms a selection."""
-        if self.engine.game_map.in_bounds(*event.tile):
+        location = self.engine.game_map.screen_to_map(*event.tile)
+        if location is not None:
             if event.button == 1:
-                return self.on_index_selected(*event.tile)
+                return self.on_index_selected(*location)
         return super().ev_mousebuttondown()
 
     def on_index_selected(self, x: int, y: int) -> Optional[ActionOrHandler]:
@@ -468,7 +473,7 @@ class AreaRangedAttackHandler(SelectIndexHandler):
     def on_render(self, console: tcod.console) -> None:
         """Highlight the title under the cursor."""
         super().on_render(console)
-        x, y = self.engine.mouse_location
+        x, y = self.engine.game_map.map_to_screen(*self.engine.mouse_location)
         # Draw a polygon around the targeted area. Allows the player to see the area of effect.
         console.draw_frame(
             x=x - self.radius - 1,
@@ -492,7 +497,8 @@ class MainGameEventHandler(EventHandler):
 
         player = self.engine.player
 
-        if key == tcod.event.K_PERIOD and modifier & (
+        # ">" and "<" both take whichever stairs the player is standing on.
+        if key in (tcod.event.K_PERIOD, tcod.event.K_COMMA) and modifier & (
             tcod.event.KMOD_LSHIFT | tcod.event.KMOD_RSHIFT
         ):
             return actions.TakeStairsAction(player)
@@ -528,6 +534,8 @@ class MainGameEventHandler(EventHandler):
 class GameOverEventHandler(EventHandler):
     def on_quit(self) -> None:
         """Handle exiting out of a finished game."""
+        if self.engine.journal:
+            self.engine.journal.discard()
         if os.path.exists("savegame.sav"):
             os.remove("savegame.sav")  # Deletes the active save file.
         raise exceptions.QuitWithoutSaving()  # Avoid saving a finished game.
@@ -0,0 +1,463 @@
+"""
+An append-only journal of what changed each turn, kept next to the save it follows.
+
+The save is a full checkpoint, see savefile.  Each turn appends one frame holding only the tiles,
+explored area, entities, schedule, messages and save header fields that changed since the last
+frame.  So a crash loses at most the turn in progress, and a turn costs what it changed rather
+than what the world holds.  Every CHECKPOINT_INTERVAL turns, once the journal passes
+MAX_JOURNAL_BYTES, and whenever the player changes floor, the save is rewritten and the journal
+starts over.  That save is written in the background, see Journal.
+
+A frame is its payload's length (u32) and CRC-32 (u32), then the payload: zlib-compressed JSON.
+The first frame names the checkpoint the journal follows, so a journal left over from an older
+checkpoint is ignored.  A frame cut short by a crash ends the journal.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+import struct
+import zlib
+from concurrent.futures import Future
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+from entity import Actor
+from message_log import Message
+import savefile
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from entity import Entity
+    from game_map import GameMap
+
+# A save's journal is kept under the save's name with this added.
+JOURNAL_SUFFIX = ".journal"
+# The journal after a checkpoint that's still being written is kept under this, added to that.
+PENDING_SUFFIX = ".next"
+# Turns between checkpoints, and the journal size that forces one sooner.
+CHECKPOINT_INTERVAL = 200
+MAX_JOURNAL_BYTES = 1 << 20
+
+FRAME_HEADER = struct.Struct("<II")
+# Where the carrying actor is in an entity record, see savefile.entity_record.
+OWNER = savefile.ENTITY_DT.names.index("owner")
+
+
+class Journal:
+    """
+    Journals a game into `filename` and the journal next to it.  Starts with a checkpoint, after
+    that record_turn must be called at the end of every turn.
+
+    Checkpoints are snapshotted at once but written by savefile's save pool, so the game never
+    waits on one.  Until the new save is on disk turns go both to the journal after the old save
+    and to a new one after the new save, kept under PENDING_SUFFIX.  Once the save is written the
+    new journal takes the old one's place.  So whenever the game stops there's a save on disk with
+    a journal that follows it.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        filename: str,
+        checkpoint_interval: int = CHECKPOINT_INTERVAL,
+        max_bytes: int = MAX_JOURNAL_BYTES,
+    ):
+        self.engine = engine
+        self.filename = filename
+        self.path = filename + JOURNAL_SUFFIX
+        self.checkpoint_interval = checkpoint_interval
+        self.max_bytes = max_bytes
+        self._current: Optional[JournalFile] = None
+        # The checkpoint being written, and the journal which follows it.
+        self._pending: Optional[Tuple[Future[None], JournalFile]] = None
+        self._turns = 0
+        self.checkpoint()
+
+    @property
+    def saving(self) -> bool:
+        """Whether a checkpoint is still being written."""
+        return self._pending is not None and not self._pending[0].done()
+
+    def checkpoint(self, wait: bool = False) -> None:
+        """Save the whole game and start a new, empty journal after it.
+        Unless `wait` is set this returns before the save is written.
+        """
+        self._finish_checkpoint(wait=True)  # One at a time, so saves land in order.
+        token = os.urandom(8).hex()
+        save = savefile.save_in_background(self.engine, self.filename, checkpoint=token)
+        self._pending = save, JournalFile(self.path + PENDING_SUFFIX, token, self.engine)
+        self._turns = 0
+        if wait:
+            self._finish_checkpoint(wait=True)
+
+    def record_turn(self) -> None:
+        """Append what changed this turn, then checkpoint if it's time to.
+        If a checkpoint saved in the background failed, that's raised once the turn is journaled.
+        """
+        self._turns += 1
+        game_map = self.engine.game_map
+        journals = [journal for journal in (self._current, self._pending_journal) if journal]
+        journaled = game_map.tiles.deltas is not None  # Tiles that can't be rebuilt aren't journaled.
+        if journaled:
+            awake = set(game_map.activity.awake_actors())
+            changed = set(game_map.changed_entities)
+            game_map.changed_entities.clear()
+            for journal in journals:
+                # A journal left on another floor is done with, once its successor is saved.
+                if journal.game_map is game_map:
+                    journal.record_turn(awake, changed)
+
+        # Written to both journals, the turn is kept whether or not the pending save went through.
+        self._finish_checkpoint()
+        latest = self._pending_journal or self._current
+        assert latest is not None
+        if (
+            not journaled
+            or latest.game_map is not game_map
+            or self._turns >= self.checkpoint_interval
+            or latest.size >= self.max_bytes
+        ):
+            self.checkpoint()
+
+    def close(self) -> None:
+        """Let any checkpoint in progress finish, then close the journal."""
+        self._finish_checkpoint(wait=True)
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+    def discard(self) -> None:
+        """Close the journal and delete it along with its save."""
+        if self._pending is not None:
+            self._pending[0].exception()  # Wait for the save so it isn't written after its removal.
+            self._pending[1].close()
+            self._pending = None
+        self.close()
+        for path in (self.path, self.path + PENDING_SUFFIX, self.filename):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @property
+    def _pending_journal(self) -> Optional[JournalFile]:
+        return self._pending[1] if self._pending is not None else None
+
+    def _finish_checkpoint(self, wait: bool = False) -> None:
+        """Once the pending checkpoint is saved, make its journal the current one."""
+        if self._pending is None:
+            return
+        save, journal = self._pending
+        if not wait and not save.done():
+            return
+        self._pending = None
+        try:
+            save.result()
+        except Exception:
+            # The old save and journal are still good, carry on with them.
+            journal.close()
+            os.remove(journal.path)
+            raise
+        if self._current is not None:
+            self._current.close()
+        journal.rename(self.path)
+        self._current = journal
+
+
+class JournalFile:
+    """
+    One journal file, and what the game looks like as of the checkpoint it follows and the frames
+    written since.  It must be created right when its checkpoint is snapshotted.
+
+    Entities are known by an id: their row in the checkpoint, or the next free number for those
+    which turned up since.  A frame only holds the records of entities which could have changed:
+    the player and what they carry, monsters which are or just were awake, and whatever the map
+    saw spawn, move, die or leave.  Of those, only records which differ from the last written are
+    written.
+    """
+
+    def __init__(self, path: str, checkpoint: str, engine: Engine):
+        self.path = path
+        self.engine = engine
+        self._file: BinaryIO = open(path, "wb")
+        self._write_frame({"checkpoint": checkpoint})
+
+        # Remember what the checkpoint holds, to tell what changes after it.
+        game_map = engine.game_map
+        self.game_map = game_map
+        entities, owners = savefile.floor_entities(game_map)
+        self._ids: Dict[Entity, int] = {entity: i for i, entity in enumerate(entities)}
+        self._entities: Dict[int, Entity] = dict(enumerate(entities))
+        self._next_id = len(entities)
+        self._records: Dict[int, Tuple[Any, ...]] = {}
+        self._carried: Dict[int, List[int]] = {}
+        for i, (entity, owner) in enumerate(zip(entities, owners)):
+            carrier: Optional[Actor] = entities[owner] if owner >= 0 else None  # type: ignore
+            self._records[i] = savefile.entity_record(entity, carrier, owner, game_map.activity)
+            if owner >= 0:
+                self._carried.setdefault(owner, []).append(i)
+        self._awake: Set[Actor] = set(game_map.activity.awake_actors())
+        self._schedule = self._schedule_of(game_map)
+        self._tiles_version = game_map.tiles.version
+        self._tile_deltas = dict(game_map.tiles.deltas or {})
+        self._fov_key = game_map.fov_key
+        self._message_count = len(engine.message_log)
+        self._last_message = engine.message_log.recent[-1] if self._message_count else None
+        self._last_message_count = self._last_message.count if self._last_message else 0
+        self._summary = savefile.SaveHeader.of(engine).summary
+
+    @property
+    def size(self) -> int:
+        return self._file.tell()
+
+    def record_turn(self, awake: Set[Actor], changed: Set[Entity]) -> None:
+        """Append a frame of what changed, given the awake actors and the map's changed entities."""
+        frame: Dict[str, Any] = {}
+        self._record_tiles(self.game_map, frame)
+        self._record_entities(self.game_map, awake, changed, frame)
+        self._record_messages(frame)
+        summary = savefile.SaveHeader.of(self.engine).summary
+        if summary != self._summary:
+            frame["summary"] = self._summary = summary
+        if frame:
+            self._write_frame(frame)
+
+    def rename(self, path: str) -> None:
+        """Move the journal to `path`, and keep appending to it there."""
+        self._file.close()
+        os.replace(self.path, path)
+        self.path = path
+        self._file = open(path, "ab")
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _record_tiles(self, game_map: GameMap, frame: Dict[str, Any]) -> None:
+        tiles = game_map.tiles
+        if tiles.version != self._tiles_version:
+            self._tiles_version = tiles.version
+            assert tiles.deltas is not None
+            changed = [
+                [x, y, tile]
+                for (x, y), tile in tiles.deltas.items()
+                if self._tile_deltas.get((x, y)) != tile
+            ]
+            if changed:
+                frame["tiles"] = changed
+                self._tile_deltas.update(((x, y), tile) for x, y, tile in changed)
+
+        # Tiles are only explored by an FOV update, and only within its area.
+        if game_map.fov_key != self._fov_key and game_map.fov_area is not None:
+            self._fov_key = game_map.fov_key
+            x1, y1, x2, y2 = game_map.fov_area
+            explored = np.asarray(game_map.explored[x1:x2, y1:y2], dtype=bool)
+            frame["explored"] = [x1, y1, x2, y2, base64.b64encode(np.packbits(explored)).decode()]
+
+    def _record_entities(
+        self, game_map: GameMap, awake: Set[Actor], changed: Set[Entity], frame: Dict[str, Any]
+    ) -> None:
+        candidates: Set[Entity] = {self.engine.player, *awake, *self._awake, *changed}
+        self._awake = awake
+
+        seen: Set[Entity] = set()
+        dropped: Set[Entity] = set()
+        for entity in candidates:
+            if entity not in game_map.entities:
+                continue
+            entity_id = self._record(entity, None, -1, game_map, frame)
+            seen.add(entity)
+            if isinstance(entity, Actor):
+                item_ids = [
+                    self._record(item, entity, entity_id, game_map, frame)
+                    for item in entity.inventory.items
+                ]
+                seen.update(entity.inventory.items)
+                carried = self._carried.get(entity_id, [])
+                if item_ids != carried:
+                    frame.setdefault("inventories", []).append([entity_id, item_ids])
+                    self._carried[entity_id] = item_ids
+                    dropped.update(self._entities[i] for i in carried if i not in item_ids)
+
+        # Whatever left the map or an inventory without turning up anywhere else is gone.
+        removed = [
+            self._ids[entity] for entity in candidates | dropped
+            if entity not in seen and entity in self._ids
+        ]
+        for entity_id in removed:
+            del self._ids[self._entities.pop(entity_id)]
+            del self._records[entity_id]
+            self._carried.pop(entity_id, None)
+        if removed:
+            frame["removed"] = removed
+
+        schedule = self._schedule_of(game_map)
+        if schedule != self._schedule:
+            frame["schedule"] = self._schedule = schedule
+
+    def _record(
+        self,
+        entity: Entity,
+        owner: Optional[Actor],
+        owner_id: int,
+        game_map: GameMap,
+        frame: Dict[str, Any],
+    ) -> int:
+        """Write an entity's record if it changed.  Returns the entity's id."""
+        entity_id = self._ids.get(entity)
+        if entity_id is None:
+            entity_id = self._ids[entity] = self._next_id
+            self._entities[entity_id] = entity
+            self._next_id += 1
+        record = savefile.entity_record(entity, owner, owner_id, game_map.activity)
+        if self._records.get(entity_id) != record:
+            self._records[entity_id] = record
+            frame.setdefault("entities", []).append([entity_id, record])
+        return entity_id
+
+    def _schedule_of(self, game_map: GameMap) -> List[Any]:
+        scheduler = game_map.scheduler
+        return [scheduler.time, [[self._ids[actor], time] for time, actor in scheduler.entries()]]
+
+    def _record_messages(self, frame: Dict[str, Any]) -> None:
+        log = self.engine.message_log
+        # Repeats of the last message stack onto it rather than being added.
+        if self._last_message is not None and self._last_message.count != self._last_message_count:
+            frame["last_count"] = self._last_message.count
+        added = len(log) - self._message_count
+        if added:
+            frame["messages"] = [
+                [message.plain_text, list(message.fg), message.count]
+                for message in log.recent[-added:]
+            ]
+            self._message_count = len(log)
+            self._last_message = log.recent[-1]
+        self._last_message_count = self._last_message.count if self._last_message else 0
+
+    def _write_frame(self, frame: Dict[str, Any]) -> None:
+        payload = zlib.compress(json.dumps(frame, separators=(",", ":")).encode())
+        self._file.write(FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+def load(filename: str) -> Engine:
+    """Load a save, and replay its journal over it if there's a journal which follows this save."""
+    sections = savefile.read_sections(filename)
+    frames = journal_frames(filename, sections.header.checkpoint)
+    if not frames:
+        return savefile.load_sections(sections)
+
+    _replay_entities(sections, frames)
+    engine = savefile.load_sections(sections)
+    _replay_map(engine, frames)
+    return engine
+
+
+def read_header(filename: str) -> savefile.SaveHeader:
+    """Read a save's header, brought up to date with the summaries in its journal."""
+    header = savefile.read_header(filename)
+    for frame in journal_frames(filename, header.checkpoint):
+        if "summary" in frame:
+            header = savefile.SaveHeader(header.checkpoint, *frame["summary"])
+    return header
+
+
+def journal_frames(filename: str, checkpoint: Optional[str]) -> List[Dict[str, Any]]:
+    """Return the frames written after the save's checkpoint, if its journal is around."""
+    path = filename + JOURNAL_SUFFIX
+    # Stopping while a checkpoint was being renamed into place can leave its journal pending.
+    for frames in (read_frames(path), read_frames(path + PENDING_SUFFIX)):
+        if checkpoint is not None and frames and frames[0].get("checkpoint") == checkpoint:
+            return frames[1:]
+    return []
+
+
+def read_frames(path: str) -> List[Dict[str, Any]]:
+    """Return the frames of a journal, up to the first one that's incomplete or damaged."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+    frames = []
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(data):
+        length, crc = FRAME_HEADER.unpack_from(data, offset)
+        payload = data[offset + FRAME_HEADER.size:offset + FRAME_HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        frames.append(json.loads(zlib.decompress(payload)))
+        offset += FRAME_HEADER.size + length
+    return frames
+
+
+def _replay_entities(sections: savefile.Sections, frames: List[Dict[str, Any]]) -> None:
+    """Apply the entity and schedule changes of the frames to a save's sections."""
+    floor = sections["floor"]
+    # In the checkpoint an entity's id is its row.
+    records = dict(
+        enumerate(savefile.unpack_rows(sections["entities"], floor["templates"], floor["names"]))
+    )
+    carried: Dict[int, List[int]] = {}
+    for entity_id, record in records.items():
+        if record[OWNER] >= 0:
+            carried.setdefault(record[OWNER], []).append(entity_id)
+    time, schedule = floor["time"], sections["schedule"].tolist()
+
+    for frame in frames:
+        for entity_id, record in frame.get("entities", ()):
+            records[entity_id] = tuple(record)
+        for owner_id, item_ids in frame.get("inventories", ()):
+            carried[owner_id] = item_ids
+        for entity_id in frame.get("removed", ()):
+            del records[entity_id]
+            carried.pop(entity_id, None)
+        if "schedule" in frame:
+            time, schedule = frame["schedule"]
+
+    # Lay the entities out in rows again, those on the map first and then what each one carries.
+    order = [entity_id for entity_id, record in records.items() if record[OWNER] < 0]
+    order += [item_id for owner_id in order[:] for item_id in carried.get(owner_id, ())]
+    row_of = {entity_id: row for row, entity_id in enumerate(order)}
+    rows, floor["templates"], floor["names"] = savefile.pack_records([
+        (
+            *records[entity_id][:OWNER],
+            row_of[records[entity_id][OWNER]] if records[entity_id][OWNER] >= 0 else -1,
+            *records[entity_id][OWNER + 1:],
+        )
+        for entity_id in order
+    ])
+    sections["entities"] = rows
+    floor["player"] = row_of[floor["player"]]
+    floor["time"] = time
+    sections["schedule"] = np.array(
+        [(row_of[entity_id], due) for entity_id, due in schedule], dtype=savefile.SCHEDULE_DT,
+    )
+
+
+def _replay_map(engine: Engine, frames: List[Dict[str, Any]]) -> None:
+    """Apply the tile, explored and message changes of the frames to a loaded game."""
+    game_map = engine.game_map
+    messages = engine.message_log.recent
+    for frame in frames:
+        if "tiles" in frame:
+            xs, ys, tiles = np.array(frame["tiles"]).T
+            game_map.tiles[xs, ys] = tiles
+        if "explored" in frame:
+            x1, y1, x2, y2, bits = frame["explored"]
+            explored = np.unpackbits(
+                np.frombuffer(base64.b64decode(bits), dtype=np.uint8), count=(x2 - x1) * (y2 - y1)
+            )
+            game_map.explored[x1:x2, y1:y2] = explored.reshape(x2 - x1, y2 - y1).astype(bool)
+        if "last_count" in frame:
+            messages[-1].count = frame["last_count"]
+        for text, fg, count in frame.get("messages", ()):
+            message = Message(text, tuple(fg))  # type: ignore
+            message.count = count
+            messages.append(message)
+        if "summary" in frame:
+            engine.turn_count = savefile.SaveHeader(None, *frame["summary"]).turns
+
+    # What's visible is worked out again from where the player stands now.
+    game_map.reset_fov()
+    engine.update_fov()
@@ -0,0 +1,211 @@
+"""
+Reads saves from before the savefile format, which were an lzma-compressed pickle of the Engine.
+
+The pickle is loaded without the game's classes.  Each of its game objects comes back as an
+OldObject holding the attributes it was pickled with, so it doesn't matter how those classes have
+changed since.  Only numpy arrays, the containers holding them, and the RenderOrder and
+EquipmentType enums are loaded as they are.  The old game is then laid out as the sections of a
+save in the current format and loaded by savefile like any other.  It's written in the current
+format the next time it's saved.
+"""
+from __future__ import annotations
+
+import io
+import lzma
+import pickle
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import numpy as np  # type: ignore
+
+from components.equipment import SLOTS
+import entity_assemblyline
+import savefile
+import tile_types
+
+# Every old save is an xz stream, which starts with this.
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# The classes loaded as they are, by module.  Everything else the pickle names is an OldObject.
+KEPT_CLASSES = {
+    "builtins": ("set", "frozenset", "list", "dict", "tuple"),
+    "numpy": ("ndarray", "dtype"),
+    "numpy.core.multiarray": ("_reconstruct", "scalar"),
+    "numpy._core.multiarray": ("_reconstruct", "scalar"),
+    "render_order": ("RenderOrder",),
+    "equipment_types": ("EquipmentType",),
+}
+
+# Corpses are named after the template of the actor which died.
+CORPSE_PREFIX = "remains of "
+
+
+class OldObject:
+    """A game object from an old save, with only the attributes it was pickled with."""
+
+    kind = ""  # The name of the class it was pickled as.
+
+
+class OldSaveUnpickler(pickle.Unpickler):
+    def __init__(self, file: Any):
+        super().__init__(file)
+        self._classes: Dict[Tuple[str, str], Type[OldObject]] = {}
+
+    def find_class(self, module: str, name: str) -> Any:
+        if name in KEPT_CLASSES.get(module, ()):
+            return super().find_class(module, name)
+        if (module, name) not in self._classes:
+            self._classes[module, name] = type(name, (OldObject,), {"kind": name})
+        return self._classes[module, name]
+
+
+def is_old_save(data: bytes) -> bool:
+    return data[:len(XZ_MAGIC)] == XZ_MAGIC
+
+
+def read_sections(data: bytes) -> savefile.Sections:
+    """Convert an old save into the sections a save of the same game would have now."""
+    try:
+        engine = OldSaveUnpickler(io.BytesIO(lzma.decompress(data))).load()
+    except (lzma.LZMAError, pickle.UnpicklingError, EOFError) as exc:
+        raise ValueError(f"Not a save file: {exc}") from exc
+    if not isinstance(engine, OldObject) or engine.kind != "Engine":
+        raise ValueError("Not a save file.")
+
+    world, game_map, player = engine.game_world, engine.game_map, engine.player
+    entities, rows, templates, names = _entity_rows(game_map, player)
+    floor = {
+        "width": game_map.width,
+        "height": game_map.height,
+        "chunk_size": None,
+        "stairs_down_location": tuple(game_map.stairs_down_location),
+        "stairs_up_location": None,  # Old floors had no way back up.
+        "entry_location": (player.x, player.y),
+        "time": 0,
+        "recipe": None,
+        "templates": templates,
+        "names": names,
+        "player": entities.index(player),
+    }
+    state = {
+        "world": {
+            "map_width": world.map_width,
+            "map_height": world.map_height,
+            "max_rooms": world.max_rooms,
+            "room_min_size": world.room_min_size,
+            "room_max_size": world.room_max_size,
+            "current_floor": world.current_floor,
+        },
+        "history": 0,
+        "stored_floors": [],
+    }
+    header = savefile.SaveHeader(
+        None,
+        world.current_floor,
+        player.level.current_level,
+        player.fighter._hp,
+        player.fighter.max_hp,
+        0,  # Turns weren't counted.
+    )
+    sections = savefile.Sections(header, bytearray(), {})
+    sections.update({
+        "engine": state,
+        "floor": floor,
+        "tiles": _tile_ids(game_map.tiles),
+        "explored": np.asfortranarray(game_map.explored, dtype=bool),
+        "entities": rows,
+        "schedule": np.zeros(0, dtype=savefile.SCHEDULE_DT),  # Monsters wake as the player nears.
+        "messages": savefile.encode_messages(engine.message_log.messages),
+    })
+    return sections
+
+
+def _tile_ids(tiles: np.ndarray) -> np.ndarray:
+    """Return the palette ids of an old map's tiles, which were stored as whole tile_dt records."""
+    tiles = np.asarray(tiles).astype(tile_types.tile_dt)
+    ids = np.zeros(tiles.shape, dtype=np.uint8, order="F")
+    known = np.zeros(tiles.shape, dtype=bool)
+    for tile_id, tile in enumerate(tile_types.palette):
+        same = (tiles == tile) & ~known
+        ids[same] = tile_id
+        known |= same
+    if not known.all():
+        raise ValueError("The save has tiles this game doesn't know.")
+    return ids
+
+
+def _entity_rows(
+    game_map: OldObject, player: OldObject
+) -> Tuple[List[OldObject], np.ndarray, List[str], List[str]]:
+    """Lay out an old map's entities the way savefile._entity_rows does."""
+    entities: List[OldObject] = sorted(
+        game_map.entities,  # type: ignore
+        key=lambda entity: (entity is not player, entity.render_order.value, entity.x, entity.y),
+    )
+    owners = [-1] * len(entities)
+    for row, entity in enumerate(entities[:]):
+        if entity.kind == "Actor":
+            entities.extend(entity.inventory.items)  # type: ignore
+            owners.extend([row] * len(entity.inventory.items))  # type: ignore
+    records = [
+        _entity_record(entity, entities[owner] if owner >= 0 else None, owner)
+        for entity, owner in zip(entities, owners)
+    ]
+    rows, templates, names = savefile.pack_records(records)
+    return entities, rows, templates, names
+
+
+def _entity_record(entity: Any, owner: Any, owner_row: int) -> Tuple[Any, ...]:
+    """Return the fields savefile.entity_record would for an old entity."""
+    template = _template_of(entity.name)
+    slot = -1
+    if owner is not None:
+        worn = [getattr(owner.equipment, name, None) is entity for name in SLOTS]
+        slot = worn.index(True) if True in worn else -1
+    stats: Tuple[int, ...] = (0,) * 10
+    if entity.kind == "Actor":
+        fighter, ai = entity.fighter, entity.ai
+        previous_ai, ai_turns = None, 0
+        if ai is not None and ai.kind == "ConfusedEnemy":
+            previous_ai, ai_turns = ai.previous_ai, ai.turns_left
+        stats = (
+            fighter._hp,
+            fighter.max_hp,
+            fighter.base_power,
+            fighter.base_defense,
+            entity.level.current_level,
+            entity.level.current_xp,
+            entity_assemblyline.templates[template].speed,  # type: ignore
+            _ai_index(ai),
+            _ai_index(previous_ai),
+            ai_turns,
+        )
+    return (
+        template,
+        entity.name,
+        entity.x,
+        entity.y,
+        owner_row,
+        slot,
+        ord(entity.char),
+        tuple(entity.color),
+        entity.render_order.value,
+        entity.blocks_movement,
+        *stats,
+        -1,  # Asleep, see ActivityTracker.
+    )
+
+
+def _template_of(name: str) -> str:
+    """Return the name of the template an old entity called `name` was spawned from."""
+    if name.startswith(CORPSE_PREFIX):
+        name = name[len(CORPSE_PREFIX):]
+    for template, prototype in entity_assemblyline.templates.items():
+        if prototype.name == name:
+            return template
+    raise ValueError(f"The save has a {name}, which this game doesn't know.")
+
+
+def _ai_index(ai: Optional[OldObject]) -> int:
+    """Return the index in savefile.AI_CLASSES of the class an old AI was."""
+    kinds = [ai_class.__name__ if ai_class else "" for ai_class in savefile.AI_CLASSES]
+    return kinds.index(ai.kind if ai is not None else "")
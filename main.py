@@ -9,7 +9,10 @@ import setup_game
 def save_game(handler: input_handlers.BaseEventHandler, filename: str) -> None:
     """If the current event handler has an active Engine instance, save it."""
     if isinstance(handler, input_handlers.EventHandler):
-        handler.engine.save_as(filename)
+        if handler.engine.journal:
+            handler.engine.journal.checkpoint(wait=True)  # Also empties the journal.
+        else:
+            handler.engine.save_as(filename)
         print("Game saved.")
 
 
@@ -40,8 +43,13 @@ def main() -> None:
                 handler.on_render(console=root_console)
                 context.present(root_console)
 
+                # While a save is being written, wake up to take its indicator down once it's done.
+                timeout = None
+                if isinstance(handler, input_handlers.EventHandler) and handler.engine.journal:
+                    timeout = 0.1 if handler.engine.journal.saving else None
+
                 try:
-                    for event in tcod.event.wait():
+                    for event in tcod.event.wait(timeout):
                         context.convert_event(event)
                         handler = handler.handle_events(event)
                 except Exception:  # Handle exceptions in game.
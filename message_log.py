@@ -1,11 +1,16 @@
+from __future__ import annotations
+
 from types import MethodDescriptorType
-from typing import Iterable, List, Reversible, Tuple
+from typing import Iterable, List, Optional, Reversible, Tuple, TYPE_CHECKING
 import textwrap
 
 import tcod
 
 import color
 
+if TYPE_CHECKING:
+    from savefile import SavedMessages
+
 
 class Message:
     def __init__(self, text: str, fg: Tuple[int,int,int]):
@@ -22,22 +27,36 @@ class Message:
 
 class MessageLog:
     def __init__(self) -> None:
-        self.messages: List[Message] = []
+        # The latest messages.  All of them, unless older ones are still in `history`.
+        self.recent: List[Message] = []
+        # The messages from before `recent` in a loaded save, until they're first asked for.
+        self.history: Optional[SavedMessages] = None
+
+    def __len__(self) -> int:
+        return len(self.recent) + (self.history.count if self.history is not None else 0)
+
+    @property
+    def messages(self) -> List[Message]:
+        #Every message. Loads the history first if it's still saved away.
+        if self.history is not None:
+            self.recent[:0] = self.history.load()
+            self.history = None
+        return self.recent
 
     def add_message(
         self, text: str, fg: Tuple[int, int, int] = color.white, *, stack: bool = True,
     ) -> None:
         #push message into the log. if stack is true, stack with previous identical messages
-        if stack and self.messages and text == self.messages[-1].plain_text:
-            self.messages[-1].count += 1
+        if stack and self.recent and text == self.recent[-1].plain_text:
+            self.recent[-1].count += 1
         else:
-            self.messages.append(Message(text, fg))
+            self.recent.append(Message(text, fg))
 
     def render(
         self, console: tcod.Console, x: int, y: int, width: int, height:int,
     ) -> None:
         #Render the log over a given area
-        self.render_messages(console, x, y, width, height, self.messages)
+        self.render_messages(console, x, y, width, height, self.recent)
     
     @classmethod
     def render_messages(
@@ -1,15 +1,13 @@
 from __future__ import annotations
 import random
-from typing import Dict, Iterator, Tuple, List, TYPE_CHECKING
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, List, TYPE_CHECKING
 import numpy as np
-from numpy.lib.shape_base import tile
 from game_map import GameMap
 import tile_types
 import tcod
 import entity_assemblyline
 
 if TYPE_CHECKING:
-    from engine import Engine
     from entity import Entity
 
 
@@ -57,6 +55,7 @@ def get_entities_at_random(
     weighted_chances_by_floor: Dict[int, List[Tuple[int,int]]], 
     number_of_entities: int,
     floor: int,
+    rng: random.Random,
 ) -> List[Entity]:
     entity_weighted_chances = {}
 
@@ -73,7 +72,7 @@ def get_entities_at_random(
     entities = list(entity_weighted_chances.keys())
     entity_weighted_chance_values = list(entity_weighted_chances.values())
 
-    chosen_entities = random.choices(
+    chosen_entities = rng.choices(
         entities, weights=entity_weighted_chance_values, k=number_of_entities
     )
 
@@ -109,6 +108,60 @@ class RectangularRoom:
         )
 
 
+# The size of the squares of the map RoomPlacer files rooms under.
+ROOM_BUCKET_SIZE = 32
+
+
+class RoomPlacer:
+    """
+    Places rooms so that none overlap, checking each against only the rooms near it rather than
+    every one placed so far.  Rooms are filed under every ROOM_BUCKET_SIZE square of the map they
+    touch, so memory grows with the rooms placed, not the size of the map.
+    Rooms are claimed including their walls, so like RectangularRoom.intersects, two rooms never
+    share a wall.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.buckets: Dict[Tuple[int, int], List[RectangularRoom]] = {}
+
+    def _buckets_of(self, room: RectangularRoom) -> Iterator[Tuple[int, int]]:
+        size = ROOM_BUCKET_SIZE
+        for bucket_x in range(room.x1 // size, room.x2 // size + 1):
+            for bucket_y in range(room.y1 // size, room.y2 // size + 1):
+                yield bucket_x, bucket_y
+
+    def fits(self, room: RectangularRoom) -> bool:
+        # Overlapping rooms share a tile, so they're always filed under a bucket in common.
+        return not any(
+            room.intersects(other)
+            for key in self._buckets_of(room)
+            for other in self.buckets.get(key, ())
+        )
+
+    def claim(self, room: RectangularRoom) -> None:
+        """Mark a room as taken.  It must fit."""
+        assert self.fits(room), "Claimed rooms can't overlap."
+        for key in self._buckets_of(room):
+            self.buckets.setdefault(key, []).append(room)
+
+    def place(
+        self, room_width: int, room_height: int, rng: random.Random
+    ) -> Optional[RectangularRoom]:
+        """Claim a room of this size at a random position, or return None if it overlaps another."""
+        room = RectangularRoom(
+            rng.randint(0, self.width - room_width - 1),
+            rng.randint(0, self.height - room_height - 1),
+            room_width,
+            room_height,
+        )
+        if not self.fits(room):
+            return None
+        self.claim(room)
+        return room
+
+
 # TEST OF CELLULAR AUTOMATA FLOOR GENERATION
 class CellFloor:
     def __init__(self, width: int, height: int, probability: float):
@@ -116,72 +169,129 @@ class CellFloor:
         self.height = height
         self.probability = probability
     
-    def generate(self, dungeon: GameMap) -> GameMap:
-        # Initial carving of tiles
-        for i in range(self.width):
-            for j in range(self.height):
-                choice = random.uniform(0, 1)
-                if choice < self.probability:
-                    dungeon.tiles[i][j] = tile_types.wall
-                else: dungeon.tiles[i][j] = tile_types.floor
+    def generate(self, dungeon: GameMap, rng: random.Random) -> GameMap:
+        # Initial carving of tiles, drawn column by column.
+        # rng.uniform(0, 1) is rng.random(), so the same seed carves the same tiles.
+        count = self.width * self.height
+        draws = np.fromiter((rng.random() for _ in range(count)), dtype=float, count=count)
+        walls = draws.reshape(self.width, self.height) < self.probability
 
         # Reruns to create realistic cave structure using Cellular Automata rules
         generations = 5
         for generation in range(generations):
-            for i in range(self.width):
-                for j in range(self.height):
-                    # Get number of walls within range of 1 from current tile
-                    sub = dungeon.tiles[max(i-1, 0):min(i+2, self.width), max(j-1, 0):min(j+2, self.height)]
-                    mat = np.array(sub)
-                    walls_one_away = len(np.where(mat.flatten() == tile_types.wall)[0])
-                    # Get number of walls within range of 2 from current tile
-                    sub = dungeon.tiles[max(i-2, 0):min(i+3, self.width), max(j-2, 0):min(j+3, self.height)]
-                    mat = np.array(sub)
-                    walls_two_away = len(np.where(mat.flatten() == tile_types.wall)[0])
-                    # For the first five generations, build a scaffolding of walls
-                    if generation < 5:
-                        if walls_one_away >= 5 or walls_two_away <= 7:
-                            dungeon.tiles[i][j] = tile_types.wall
-                        else:
-                            dungeon.tiles[i][j] = tile_types.floor
-                    else:
-                        if walls_one_away >= 5:
-                            dungeon.tiles[i][j] = tile_types.wall
-                        else:
-                            dungeon.tiles[i][j] = tile_types.floor
+            # For the first five generations, build a scaffolding of walls
+            walls = self.run_generation(walls, scaffold=generation < 5)
+
+        dungeon.tiles[0:self.width, 0:self.height] = np.where(walls, tile_types.wall, tile_types.floor)
         return dungeon
 
+    @staticmethod
+    def run_generation(walls: np.ndarray, scaffold: bool) -> np.ndarray:
+        """
+        Apply one generation of the cave rules to a wall mask.
+        A tile becomes a wall if at least 5 walls are within 1 tile of it, or while building the
+        scaffolding, if 7 or fewer walls are within 2 tiles.
+
+        Caves were first generated by rewriting the tiles in place column by column, so each tile
+        counts the new state of the tiles before it in that order and the old state of the rest.
+        That's kept here, so seeds keep their caves.  Columns are worked out in order, each from
+        the finished columns before it.  Within a column a tile only depends on the two new tiles
+        above it, so each tile's rule is a step of a machine with four states, and a whole column
+        is a prefix scan of its steps taking log2(height) vectorized passes.
+        """
+        width, height = walls.shape
+        # Two tiles of padding all around, which never count as walls.
+        old = np.zeros((width + 4, height + 4), dtype=np.int8)
+        old[2:-2, 2:-2] = walls
+
+        def sums_3(columns: np.ndarray) -> np.ndarray:
+            """Return the sums of 3 tall windows centred on each map row, from padded columns."""
+            return columns[..., 1:-3] + columns[..., 2:-2] + columns[..., 3:-1]
+
+        def sums_5(columns: np.ndarray) -> np.ndarray:
+            return sums_3(columns) + columns[..., :-4] + columns[..., 4:]
+
+        # The walls each rule counts among the tiles not yet rewritten when a tile is: the tile
+        # itself, those below it, and the columns after it.
+        later = old[2:-2, 2:-2] + old[2:-2, 3:-1]
+        later_one_away = later + sums_3(old)[3:-1]
+        later_two_away = later + old[2:-2, 4:] + sums_5(old)[3:-1] + sums_5(old)[4:]
+
+        # A state is 2 * the new tile above + the new tile two above, both 0 above the first row.
+        states = np.arange(4)
+        above, two_above = states >> 1, states & 1
+        result = np.zeros((width, height), dtype=bool)
+        padded = np.zeros(height + 4, dtype=np.int8)
+        before_3 = np.zeros(height, dtype=np.int8)  # Sums over the finished column before.
+        before_5 = np.zeros(height, dtype=np.int8)
+        before_before_5 = np.zeros(height, dtype=np.int8)  # And the one before that.
+        for x in range(width):
+            one_away = (later_one_away[x] + before_3)[:, None] + above
+            is_wall = one_away >= 5
+            if scaffold:
+                two_away = (later_two_away[x] + before_5 + before_before_5)[:, None]
+                is_wall |= two_away + above + two_above <= 7
+            # steps[y][state] is the state after row y, from `state` before it.  The scan leaves
+            # steps[y] covering every row up to y.
+            steps = 2 * is_wall + above
+            span = 1
+            while span < height:
+                steps[span:] = np.take_along_axis(steps[span:], steps[:-span], axis=1)
+                span *= 2
+            result[x] = steps[:, 0] >> 1
+
+            padded[2:-2] = result[x]
+            before_before_5 = before_5
+            before_3, before_5 = sums_3(padded), sums_5(padded)
+        return result
 
 
 def place_entities(
-    room: RectangularRoom, dungeon:GameMap, floor_number: int,
+    room: RectangularRoom, dungeon:GameMap, floor_number: int, rng: random.Random,
+    taken: Iterable[Tuple[int, int]] = (),
 ) -> None:
-    number_of_monsters=random.randint(0, get_max_value_for_floor(max_monsters_by_floor, floor_number))
-    number_of_items=random.randint(0, get_max_value_for_floor(max_items_by_floor, floor_number))
+    """
+    Spawn this room's monsters and items, each on its own free tile.
+    `taken` lists the tiles in the room which are already spoken for.  Rooms never overlap, so
+    nothing spawned in another room can be in the way.
+    """
+    number_of_monsters=rng.randint(0, get_max_value_for_floor(max_monsters_by_floor, floor_number))
+    number_of_items=rng.randint(0, get_max_value_for_floor(max_items_by_floor, floor_number))
 
     monsters: List[Entity] = get_entities_at_random(
-        enemy_chances, number_of_monsters, floor_number
+        enemy_chances, number_of_monsters, floor_number, rng
     )
 
     items: List[Entity] = get_entities_at_random(
-        item_chances, number_of_items, floor_number
+        item_chances, number_of_items, floor_number, rng
     )
 
-    for entity in monsters + items:
-        x = random.randint(room.x1 + 1, room.x2 - 1)
-        y = random.randint(room.y1 + 1, room.y2 - 1)
+    entities = monsters + items
+    if not entities:
+        return
 
-        if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
-            entity.spawn(dungeon, x, y)
+    # Draw every spawn tile at once from the room's free tiles, so no spawn is lost to a collision.
+    x_slice, y_slice = room.inner
+    occupied = np.zeros((x_slice.stop - x_slice.start, y_slice.stop - y_slice.start), dtype=bool)
+    for x, y in taken:
+        occupied[x - x_slice.start, y - y_slice.start] = True
+    free_x, free_y = np.nonzero(~occupied)
+    count = min(len(entities), free_x.size)  # Only a room smaller than its spawn count drops any.
+    picks = np.random.default_rng(rng.getrandbits(64)).choice(free_x.size, count, replace=False)
+    spawn_x = free_x[picks] + x_slice.start
+    spawn_y = free_y[picks] + y_slice.start
+
+    for entity, x, y in zip(entities, spawn_x.tolist(), spawn_y.tolist()):
+        entity.spawn(dungeon, x, y)
 
 #Takes two location tuples and creates a tunnel between them.
 def tunnel_between(
-    start: Tuple[int, int], end: Tuple[int, int]
+    start: Tuple[int, int], end: Tuple[int, int], rng: random.Random
 )-> Iterator[Tuple[int,int]]:
     #Return an L-shaped tunnel between two points.
     x1,y1 = start
     x2,y2 = end
-    if random.random() < 0.5: #50% chance of happening
+    if rng.random() < 0.5: #50% chance of happening
         corner_x, corner_y = x2,y1
     else: corner_x, corner_y = x1,y2
     #generate coordinates in the tunnel
@@ -196,49 +306,114 @@ def generate_dungeon(
     room_max_size:int, 
     map_width:int,
     map_height:int,
-    engine: Engine,
+    floor_number: int,
+    rng: random.Random,
+    entity_rng: Optional[random.Random],
+    chunk_size: Optional[int] = None,
 ) -> GameMap:
+    """
+    Build a floor, laid out with `rng` and populated with `entity_rng`.
+    The layout doesn't depend on the entities, so leaving `entity_rng` as None gives the same
+    tiles on an empty map.
+    The engine and player are left alone, so floors can be built ahead of time on another thread.
+    The player is placed at the map's `entry_location` once the floor is entered.
+    """
     # Create the dungeon map
-    player = engine.player
-    dungeon = GameMap(engine, map_width, map_height, entities=[player])
+    dungeon = GameMap(None, map_width, map_height, chunk_size=chunk_size)
     # Our "rooms" list holds, you guessed it, a list of the rooms on the current dungeon
     rooms: List[RectangularRoom] = []
 
     center_of_last_room = (0, 0)
 
-    for r in range(max_rooms):
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
+    placer = RoomPlacer(dungeon.width, dungeon.height)
 
-        x = random.randint(0, dungeon.width - room_width - 1)
-        y = random.randint(0, dungeon.height - room_height - 1)
+    for r in range(max_rooms):
+        room_width = rng.randint(room_min_size, room_max_size)
+        room_height = rng.randint(room_min_size, room_max_size)
 
-        # create a Rectangular Room object to manipulate the dungeon
-        new_room = RectangularRoom(x, y, room_width, room_height)
-        # check for room overlap
-        if any(new_room.intersects(other_room) for other_room in rooms):
+        new_room = placer.place(room_width, room_height, rng)
+        if new_room is None:
             continue # upon overlap, regenerate
-        # no intersections? continue
 
         # "dig out" floor tiles
         dungeon.tiles[new_room.inner] = tile_types.floor
 
         if len(rooms) == 0:
             # starting room
-            player.place(*new_room.center, dungeon)
+            dungeon.entry_location = new_room.center
         else:
             # tunnel to the next room (i cant stop looking at the word room. why does it look so weird)
-            for x, y in tunnel_between(rooms[-1].center, new_room.center):
-                dungeon.tiles[x, y] = tile_types.floor
+            # Dig the whole tunnel in one assignment, chunked maps pay per write rather than per tile.
+            tunnel_x, tunnel_y = np.array(list(tunnel_between(rooms[-1].center, new_room.center, rng))).T
+            dungeon.tiles[tunnel_x, tunnel_y] = tile_types.floor
             
             center_of_last_room = new_room.center
 
-        place_entities(new_room, dungeon, engine.game_world.current_floor)
+        if entity_rng is not None:
+            # The player arrives on the entry tile after the floor is built, so nothing spawns there.
+            taken = [dungeon.entry_location] if len(rooms) == 0 else []
+            place_entities(new_room, dungeon, floor_number, entity_rng, taken)
 
         dungeon.tiles[center_of_last_room] = tile_types.stairs_down
         dungeon.stairs_down_location = center_of_last_room
         
         # we're done generating. add the room to the list of rooms
         rooms.append(new_room)
+
+    if floor_number > 1:
+        # The way back up, where the player arrives.  Set last, the tunnels run through it.
+        dungeon.tiles[dungeon.entry_location] = tile_types.stairs_up
+        dungeon.stairs_up_location = dungeon.entry_location
     return dungeon
-    
+
+
+class FloorRecipe:
+    """
+    Everything needed to build a floor: the generator settings, the world seed and the floor number.
+    A recipe always builds the same floor, so a floor's tiles can be dropped and rebuilt from it.
+    """
+
+    def __init__(
+        self,
+        *,
+        seed: int,
+        floor_number: int,
+        map_width: int,
+        map_height: int,
+        max_rooms: int,
+        room_min_size: int,
+        room_max_size: int,
+        chunk_size: Optional[int] = None,
+    ):
+        self.seed = seed
+        self.floor_number = floor_number
+        self.map_width = map_width
+        self.map_height = map_height
+        self.max_rooms = max_rooms
+        self.room_min_size = room_min_size
+        self.room_max_size = room_max_size
+        self.chunk_size = chunk_size
+
+    def rng(self, purpose: str) -> random.Random:
+        """Return a new RNG for one part of this floor, the same one every time."""
+        return random.Random(f"{self.seed}:{self.floor_number}:{purpose}")
+
+    def build(self, populate: bool = True) -> GameMap:
+        """Build the floor, with its entities unless `populate` is False."""
+        dungeon = generate_dungeon(
+            max_rooms=self.max_rooms,
+            room_min_size=self.room_min_size,
+            room_max_size=self.room_max_size,
+            map_width=self.map_width,
+            map_height=self.map_height,
+            floor_number=self.floor_number,
+            rng=self.rng("layout"),
+            entity_rng=self.rng("entities") if populate else None,
+            chunk_size=self.chunk_size,
+        )
+        dungeon.tiles.track_changes(self)
+        return dungeon
+
+    def build_tile_ids(self) -> Any:
+        """Build only the tile ids of the floor."""
+        return self.build(populate=False).tiles.ids
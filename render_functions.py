@@ -13,7 +13,7 @@ def get_names_at_location(x: int, y: int, game_map: GameMap) -> str:
     if not game_map.in_bounds(x,y) or not game_map.visible[x, y]:
         return ""
     names = ", ".join(
-        entity.name for entity in game_map.entities if entity.x == x and entity.y == y
+        entity.name for entity in game_map.get_entities_at_location(x, y)
     )
     return names.capitalize()
 
@@ -39,6 +39,11 @@ def render_dungeon_level(
     x, y = location
     console.print(x=x, y=y, string=f"Dungeon level: {dungeon_level}")
 
+def render_save_indicator(console: Console, location: Tuple[int, int]) -> None:
+    """Render a note that the game is being saved."""
+    x, y = location
+    console.print(x=x, y=y, string="Saving...", fg=color.impossible)
+
 def render_names_at_mouse_location(
     console: Console, x: int, y: int, engine: Engine
 ) -> None:
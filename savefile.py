@@ -0,0 +1,674 @@
+"""
+The save file format.
+
+A save is a fixed header, a directory of sections, then the sections themselves:
+
+    magic (8 bytes) | format version (u16) | section count (u16) | checkpoint (16 bytes)
+    floor (u16) | player level (u16) | player hp (i32) | player max hp (i32) | turns (u64)
+    per section: name (24 bytes) | codec (8 bytes) | offset (u64) | length (u64)
+
+So what the main menu shows of a save is read without the rest of it, see read_header.  Sections
+are only decoded when they're looked up, and the message log's history only when it's shown.
+
+Each section is stored with one of these codecs:
+    npy        An array in numpy.save's format.  Read straight into an ndarray over the loaded
+               file, without pickle or a copy.
+    npy.z      zlib-compressed npy, for arrays which are mostly one value, like the explored tiles.
+    json.z     zlib-compressed JSON, for small bits of state and the message log.  The last
+               RECENT_MESSAGES messages are kept apart from the history before them.
+    floor.z    A floor other than the current one, as a "floor.<number>" section.  It's the
+               floor's sections laid out like a save of their own, then zlib-compressed, the
+               same blobs floor_store keeps cold floors in.  Only unpacked once it's visited.
+
+Map arrays are stored whole, or for chunked maps as a stack of their allocated chunks next to a
+"<name>.keys" array of chunk coordinates.  The visible tiles aren't stored, they're worked out
+again from where the player stands when the game is loaded.  Tiles built from a FloorRecipe only store their deltas,
+the rest is rebuilt from the world seed.  Entities are rows of ENTITY_DT: the entity_assemblyline
+template they were spawned from plus every field that can change during play.
+
+Saves from before this format, an lzma-compressed pickle of the Engine, are still read, see
+legacy_save.  They're written in this format the next time the game is saved.
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import io
+import json
+import os
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+from chunked_array import ChunkedArray
+from components.ai import ConfusedEnemy, HostileEnemy
+from components.equipment import SLOTS
+from entity import Actor
+import entity_assemblyline
+from game_map import GameMap, GameWorld
+from message_log import Message
+from render_order import RenderOrder
+import tile_types
+
+if TYPE_CHECKING:
+    from activity import ActivityTracker
+    from components.ai import BaseAI
+    from engine import Engine
+    from entity import Entity
+
+MAGIC = b"RLSAVE\x1a\n"
+FORMAT_VERSION = 4
+
+HEADER = struct.Struct("<8sHH16sHHiiQ")
+DIRECTORY_ENTRY = struct.Struct("<24s8sQQ")
+# Sections start on this boundary, so the arrays read from them are aligned.
+SECTION_ALIGNMENT = 64
+
+# A section's name, codec, and value: an array for "npy", anything JSON can hold for "json.z",
+# a floor's sections for "floor.z".  The value can also be bytes already encoded with the codec,
+# or a function returning them when it's encoded.
+Section = Tuple[str, str, Any]
+# Messages kept with the player and map, enough to fill the log on screen.
+RECENT_MESSAGES = 100
+
+ENTITY_DT = np.dtype(
+    [
+        ("template", np.uint16),  # Index into the saved template names.
+        ("name", np.uint32),  # Index into the saved names.
+        ("x", np.int32),
+        ("y", np.int32),
+        ("owner", np.int32),  # The row of the actor carrying this item, -1 for entities on the map.
+        ("slot", np.int8),  # The index in SLOTS of the slot this item is equipped in, or -1.
+        ("char", np.uint32),
+        ("color", "3B"),
+        ("render_order", np.uint8),
+        ("blocks_movement", bool),
+        ("hp", np.int32),
+        ("max_hp", np.int32),
+        ("base_power", np.int32),
+        ("base_defense", np.int32),
+        ("level", np.int32),
+        ("xp", np.int32),
+        ("speed", np.int32),
+        ("ai", np.uint8),  # Index into AI_CLASSES.
+        ("previous_ai", np.uint8),  # The AI a ConfusedEnemy goes back to.
+        ("ai_turns", np.int32),  # The turns a ConfusedEnemy has left.
+        ("idle_turns", np.int32),  # See ActivityTracker.idle_turns.
+    ]
+)
+SCHEDULE_DT = np.dtype([("row", np.int32), ("time", np.int64)])
+AI_CLASSES = (None, HostileEnemy, ConfusedEnemy)
+
+
+class SaveHeader:
+    """What a save's header says about the game in it."""
+
+    def __init__(
+        self, checkpoint: Optional[str], floor: int, level: int, hp: int, max_hp: int, turns: int
+    ):
+        self.checkpoint = checkpoint  # Names the save for the journal that follows it.
+        self.floor = floor
+        self.level = level
+        self.hp = hp
+        self.max_hp = max_hp
+        self.turns = turns
+
+    @classmethod
+    def of(cls, engine: Engine, checkpoint: Optional[str] = None) -> SaveHeader:
+        player = engine.player
+        return cls(
+            checkpoint,
+            engine.game_world.current_floor,
+            player.level.current_level,
+            player.fighter.hp,
+            player.fighter.max_hp,
+            engine.turn_count,
+        )
+
+    @property
+    def summary(self) -> List[int]:
+        """The fields which change during play."""
+        return [self.floor, self.level, self.hp, self.max_hp, self.turns]
+
+
+class Sections(Dict[str, Any]):
+    """
+    The sections of a save by name, each decoded the first time it's looked up.
+    Arrays are views of the save's data, which must stay unchanged.
+    """
+
+    def __init__(
+        self, header: SaveHeader, data: bytearray, directory: Dict[str, Tuple[str, int, int]]
+    ):
+        super().__init__()
+        self.header = header
+        self._data = data
+        self._directory = directory  # The codec, offset and length of each section.
+
+    def __missing__(self, name: str) -> Any:
+        codec, offset, length = self._directory[name]
+        value = self[name] = _decode_payload(codec, self._data, offset, length)
+        return value
+
+    def raw(self, name: str) -> bytes:
+        """Return a section still encoded."""
+        _, offset, length = self._directory[name]
+        return bytes(self._data[offset:offset + length])
+
+
+class SavedMessages:
+    """Messages from a save, kept encoded until they're asked for."""
+
+    def __init__(self, payload: bytes, count: int):
+        self.payload = payload  # A "json.z" section of encode_messages.
+        self.count = count
+
+    def load(self) -> List[Message]:
+        return decode_messages(json.loads(zlib.decompress(self.payload)))
+
+
+# Kept outside of any game object, like the other pools.  One worker, so saves land in order.
+_save_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_save_pool() -> ThreadPoolExecutor:
+    global _save_pool
+    if _save_pool is None:
+        _save_pool = ThreadPoolExecutor(1, thread_name_prefix="save")
+    return _save_pool
+
+
+def save(engine: Engine, filename: str, checkpoint: Optional[str] = None) -> None:
+    """Save a game to `filename`, replacing any earlier save only once the new one is written.
+    `checkpoint` names the save for the journal that follows it, see journal.
+    """
+    write_snapshot(filename, snapshot(engine, checkpoint))
+
+
+def save_in_background(
+    engine: Engine, filename: str, checkpoint: Optional[str] = None
+) -> Future[None]:
+    """Like save, but only the snapshot is taken now.  Encoding and writing it is left to the
+    save pool, the returned future is done once the save is on disk.
+    """
+    return get_save_pool().submit(write_snapshot, filename, snapshot(engine, checkpoint))
+
+
+def write_snapshot(filename: str, snapshot: Tuple[SaveHeader, List[Section]]) -> None:
+    header, sections = snapshot
+    write_atomic(filename, encode(sections, header))
+
+
+def load(filename: str) -> Engine:
+    """Load a game saved with `save`."""
+    return load_sections(read_sections(filename))
+
+
+def load_sections(sections: Sections) -> Engine:
+    """Rebuild a game from its sections.  The message history is left to be decoded when needed."""
+    from engine import Engine
+
+    state = sections["engine"]
+
+    game_map, player = load_floor(sections)
+    assert player is not None, "The save has no player."
+    engine = Engine(player=player)
+    engine.turn_count = sections.header.turns
+    engine.message_log.recent = decode_messages(sections["messages"])
+    if state["history"]:
+        engine.message_log.history = SavedMessages(sections.raw("history"), state["history"])
+
+    engine.game_world = GameWorld(engine=engine, **state["world"])
+    for floor in state["stored_floors"]:
+        engine.game_world.floors.add_blob(floor, sections.raw(f"floor.{floor}"))
+    game_map.engine = engine
+    engine.game_map = game_map
+    engine.update_fov()  # The visible tiles aren't saved.
+    return engine
+
+
+def snapshot(
+    engine: Engine, checkpoint: Optional[str] = None
+) -> Tuple[SaveHeader, List[Section]]:
+    """
+    Collect everything a save holds.  Arrays are copied, so the game can go on while the snapshot
+    is encoded and written.
+    """
+    log = engine.message_log
+    if log.history is not None:
+        # Never decoded, so it's saved as it was loaded.
+        history, history_count, recent = log.history.payload, log.history.count, log.recent
+    else:
+        history_count = max(len(log.recent) - RECENT_MESSAGES, 0)
+        history = encode_messages(log.recent[:history_count])
+        recent = log.recent[history_count:]
+    world = engine.game_world
+    floors: List[Section] = [
+        (f"floor.{floor}", "floor.z", snapshot_floor(game_map))
+        for floor, game_map in world.floors.hot()
+    ]
+    floors += [
+        (f"floor.{floor}", "floor.z", world.floors.blob_reader(floor))
+        for floor in world.floors.cold()
+    ]
+    state = {
+        "world": {
+            "map_width": world.map_width,
+            "map_height": world.map_height,
+            "max_rooms": world.max_rooms,
+            "room_min_size": world.room_min_size,
+            "room_max_size": world.room_max_size,
+            "current_floor": world.current_floor,
+            "chunk_size": world.chunk_size,
+            "seed": world.seed,
+            "hot_floors": world.floors.hot_floors,
+        },
+        "history": history_count,
+        "stored_floors": [floor for floor, _ in world.floors.hot()] + list(world.floors.cold()),
+    }
+    return SaveHeader.of(engine, checkpoint), [
+        ("engine", "json.z", state),
+        *snapshot_floor(engine.game_map, engine.player),
+        ("messages", "json.z", encode_messages(recent)),
+        ("history", "json.z", history),
+        *floors,
+    ]
+
+
+def encode_messages(messages: List[Message]) -> Dict[str, Any]:
+    """Store a message log by column, with the few colors in use kept in a palette."""
+    palette: Dict[Tuple[int, int, int], int] = {}
+    return {
+        "text": [message.plain_text for message in messages],
+        "fg": [palette.setdefault(tuple(message.fg), len(palette)) for message in messages],  # type: ignore
+        "count": [message.count for message in messages],
+        "palette": list(palette),
+    }
+
+
+def decode_messages(columns: Dict[str, Any]) -> List[Message]:
+    palette = [tuple(fg) for fg in columns["palette"]]
+    messages = [Message(text, palette[fg]) for text, fg in zip(columns["text"], columns["fg"])]
+    for message, count in zip(messages, columns["count"]):
+        if count != 1:
+            message.count = count
+    return messages
+
+
+def snapshot_floor(game_map: GameMap, player: Optional[Actor] = None) -> List[Section]:
+    """Collect the sections of one floor and the entities on it."""
+    tiles = game_map.tiles
+    floor = {
+        "width": game_map.width,
+        "height": game_map.height,
+        "chunk_size": game_map.chunk_size,
+        "stairs_down_location": game_map.stairs_down_location,
+        "stairs_up_location": game_map.stairs_up_location,
+        "entry_location": game_map.entry_location,
+        "time": game_map.scheduler.time,
+        "recipe": dict(vars(tiles.recipe)) if tiles.recipe is not None else None,
+    }
+    sections: List[Section] = [("floor", "json.z", floor)]
+
+    if tiles.recipe is not None:
+        assert tiles.deltas is not None
+        deltas = np.array(
+            [(x, y, tile) for (x, y), tile in tiles.deltas.items()], dtype=np.int32,
+        ).reshape(-1, 3)
+        sections.append(("tile_deltas", "npy", deltas))
+    else:
+        sections.extend(_grid_sections("tiles", tiles.ids))
+    sections.extend(_grid_sections("explored", game_map.explored, "npy.z"))
+
+    entities, rows, templates, names = _entity_rows(game_map)
+    floor["templates"] = templates
+    floor["names"] = names
+    floor["player"] = entities.index(player) if player in entities else -1
+    sections.append(("entities", "npy", rows))
+
+    row_of = {entity: row for row, entity in enumerate(entities)}
+    schedule = np.array(
+        [(row_of[actor], time) for time, actor in game_map.scheduler.entries()], dtype=SCHEDULE_DT,
+    )
+    sections.append(("schedule", "npy", schedule))
+    return sections
+
+
+def load_floor(sections: Sections) -> Tuple[GameMap, Optional[Actor]]:
+    """Rebuild a floor from its sections.  Returns the map, and the player if they were on it."""
+    from procgen import FloorRecipe
+
+    floor = sections["floor"]
+    game_map = GameMap(None, floor["width"], floor["height"], chunk_size=floor["chunk_size"])
+    game_map.stairs_down_location = tuple(floor["stairs_down_location"])
+    if floor["stairs_up_location"] is not None:
+        game_map.stairs_up_location = tuple(floor["stairs_up_location"])
+    game_map.entry_location = tuple(floor["entry_location"])
+
+    if floor["recipe"] is not None:
+        deltas = sections["tile_deltas"]
+        game_map.tiles.track_changes(FloorRecipe(**floor["recipe"]))
+        game_map.tiles.deltas = dict(zip(map(tuple, deltas[:, :2].tolist()), deltas[:, 2].tolist()))
+        game_map.tiles.drop()  # Rebuilt from the recipe when first needed.
+    else:
+        game_map.tiles = tile_types.TileArray(_load_grid(sections, "tiles", game_map.tiles.ids))
+    game_map.explored = _load_grid(sections, "explored", game_map.explored)
+
+    # Plain Python values are much quicker to read than fields of numpy records.
+    rows = [dict(zip(ENTITY_DT.names, values)) for values in sections["entities"].tolist()]
+    entities = [
+        _decode_entity(row, floor["templates"], floor["names"]) for row in rows
+    ]
+    # Fill in the carried items first, the stats an actor is saved with depend on its equipment.
+    for entity, row in zip(entities, rows):
+        if row["owner"] >= 0:
+            owner: Actor = entities[row["owner"]]  # type: ignore
+            entity.parent = owner.inventory
+            owner.inventory.items.append(entity)  # type: ignore
+            if row["slot"] >= 0:
+                setattr(owner.equipment, SLOTS[row["slot"]], entity)
+    for entity, row in zip(entities, rows):
+        if row["owner"] < 0:
+            entity.place(row["x"], row["y"], game_map)
+            if row["idle_turns"] >= 0:
+                game_map.activity.restore(entity, row["idle_turns"])  # type: ignore
+
+    scheduler = game_map.scheduler
+    scheduler.time = floor["time"]
+    for row, time in sections["schedule"].tolist():
+        scheduler.schedule(entities[row], time - scheduler.time)  # type: ignore
+
+    player = entities[floor["player"]] if floor["player"] >= 0 else None
+    return game_map, player  # type: ignore
+
+
+def floor_entities(game_map: GameMap) -> Tuple[List[Entity], List[int]]:
+    """Return the entities on a map followed by the items they carry, in the order saves store
+    them, along with the index in that list of the actor carrying each one, or -1.
+    """
+    entities: List[Entity] = sorted(game_map.entities, key=game_map.entity_table.row_of)
+    owners = [-1] * len(entities)
+    for row, entity in enumerate(entities[:]):
+        if isinstance(entity, Actor):
+            entities.extend(entity.inventory.items)
+            owners.extend([row] * len(entity.inventory.items))
+    return entities, owners
+
+
+def entity_record(
+    entity: Entity, owner: Optional[Actor], owner_row: int, activity: ActivityTracker,
+) -> Tuple[Any, ...]:
+    """Return the ENTITY_DT fields of an entity, with its template and name as strings."""
+    if entity.template is None:
+        raise ValueError(f"{entity.name} wasn't spawned from a template and can't be saved.")
+    slot = -1
+    if owner is not None:
+        worn = [getattr(owner.equipment, name) is entity for name in SLOTS]
+        slot = worn.index(True) if True in worn else -1
+    stats: Tuple[int, ...] = (0,) * 10
+    idle_turns = -1
+    if isinstance(entity, Actor):
+        fighter, ai = entity.fighter, entity.ai
+        previous_ai, ai_turns = None, 0
+        if isinstance(ai, ConfusedEnemy):
+            previous_ai, ai_turns = ai.previous_ai, ai.turns_left
+        stats = (
+            fighter.hp,
+            fighter.max_hp,
+            fighter.base_power,
+            fighter.base_defense,
+            entity.level.current_level,
+            entity.level.current_xp,
+            entity.speed,
+            AI_CLASSES.index(type(ai)) if ai else 0,
+            AI_CLASSES.index(type(previous_ai)) if previous_ai else 0,
+            ai_turns,
+        )
+        idle_turns = activity.idle_turns(entity)
+    return (
+        entity.template,
+        entity.name,
+        entity.x,
+        entity.y,
+        owner_row,
+        slot,
+        ord(entity.char),
+        entity.color,
+        entity.render_order.value,
+        entity.blocks_movement,
+        *stats,
+        idle_turns,
+    )
+
+
+def pack_records(records: List[Tuple[Any, ...]]) -> Tuple[np.ndarray, List[str], List[str]]:
+    """Turn entity records into rows of ENTITY_DT, with the template names and names they index."""
+    templates: Dict[str, int] = {}
+    names: Dict[str, int] = {}
+    rows = np.array(
+        [
+            (
+                templates.setdefault(record[0], len(templates)),
+                names.setdefault(record[1], len(names)),
+                *record[2:],
+            )
+            for record in records
+        ],
+        dtype=ENTITY_DT,
+    )
+    return rows, list(templates), list(names)
+
+
+def unpack_rows(rows: np.ndarray, templates: List[str], names: List[str]) -> List[Tuple[Any, ...]]:
+    """The reverse of pack_records."""
+    color = ENTITY_DT.names.index("color")
+    return [
+        (
+            templates[values[0]],
+            names[values[1]],
+            *values[2:color],
+            tuple(values[color].tolist()),
+            *values[color + 1:],
+        )
+        for values in rows.tolist()
+    ]
+
+
+def _entity_rows(game_map: GameMap) -> Tuple[List[Entity], np.ndarray, List[str], List[str]]:
+    """Flatten the entities on a map and the items they carry into rows of ENTITY_DT.
+    Returns the entities in row order, the rows, and the template names and names they index.
+    """
+    entities, owners = floor_entities(game_map)
+    records = [
+        entity_record(entity, entities[owner] if owner >= 0 else None, owner, game_map.activity)  # type: ignore
+        for entity, owner in zip(entities, owners)
+    ]
+    rows, templates, names = pack_records(records)
+    return entities, rows, templates, names
+
+
+def _decode_entity(row: Dict[str, Any], templates: List[str], names: List[str]) -> Entity:
+    entity = entity_assemblyline.templates[templates[row["template"]]].clone()
+    entity.name = names[row["name"]]
+    entity.x, entity.y = row["x"], row["y"]
+    entity.char = chr(row["char"])
+    entity.color = tuple(row["color"].tolist())  # type: ignore
+    entity.render_order = RenderOrder(row["render_order"])
+    entity.blocks_movement = row["blocks_movement"]
+    if isinstance(entity, Actor):
+        # Set the AI first, so that restoring a corpse's 0 hp doesn't kill it again.
+        entity.ai = _decode_ai(entity, row["ai"], row["previous_ai"], row["ai_turns"])
+        entity.fighter.max_hp = row["max_hp"]
+        entity.fighter.hp = row["hp"]
+        entity.fighter.base_power = row["base_power"]
+        entity.fighter.base_defense = row["base_defense"]
+        entity.level.current_level = row["level"]
+        entity.level.current_xp = row["xp"]
+        entity.speed = row["speed"]
+    return entity
+
+
+def _decode_ai(actor: Actor, kind: int, previous_kind: int, turns: int) -> Optional[BaseAI]:
+    ai_cls = AI_CLASSES[kind]
+    if ai_cls is None:
+        return None
+    if ai_cls is ConfusedEnemy:
+        return ConfusedEnemy(actor, _decode_ai(actor, previous_kind, 0, 0), turns)
+    return ai_cls(actor)
+
+
+def _grid_sections(name: str, grid: Any, codec: str = "npy") -> List[Section]:
+    """Return the sections for a map array, copied so later changes to the map don't show."""
+    if isinstance(grid, ChunkedArray):
+        keys = list(grid.chunk_keys())
+        chunks = np.zeros((len(keys), grid.chunk_size, grid.chunk_size), dtype=grid.dtype)
+        for i, key in enumerate(keys):
+            chunks[i] = grid.get_chunk(key)
+        return [
+            (name, codec, chunks),
+            (f"{name}.keys", "npy", np.array(keys, dtype=np.int32).reshape(-1, 2)),
+        ]
+    return [(name, codec, np.array(grid, order="F"))]
+
+
+def _load_grid(sections: Dict[str, Any], name: str, empty: Any) -> Any:
+    """Return a saved map array, with `empty` being the blank array of the right kind."""
+    if isinstance(empty, ChunkedArray):
+        for key, chunk in zip(sections[f"{name}.keys"].tolist(), sections[name]):
+            empty.set_chunk(tuple(key), chunk)
+        return empty
+    return sections[name]
+
+
+def pack_floor(sections: List[Section]) -> bytes:
+    """Pack the sections of a floor into one compressed blob, see floor_store."""
+    return zlib.compress(encode(sections))
+
+
+def unpack_floor(blob: bytes) -> GameMap:
+    game_map, _ = load_floor(decode(bytearray(zlib.decompress(blob))))
+    return game_map
+
+
+def encode(sections: List[Section], header: Optional[SaveHeader] = None) -> bytes:
+    """Lay the sections out in the save format.  Without a header the header's fields are blank."""
+    if header is None:
+        header = SaveHeader(None, 0, 0, 0, 0, 0)
+    payloads = [(name, codec, _encode_payload(codec, value)) for name, codec, value in sections]
+    offset = _align(HEADER.size + DIRECTORY_ENTRY.size * len(payloads))
+    out = bytearray(HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(payloads), (header.checkpoint or "").encode(), *header.summary
+    ))
+    body = bytearray()
+    for name, codec, payload in payloads:
+        out += DIRECTORY_ENTRY.pack(name.encode(), codec.encode(), offset + len(body), len(payload))
+        body += payload
+        body += bytes(_align(len(body)) - len(body))
+    out += bytes(offset - len(out))
+    out += body
+    return bytes(out)
+
+
+def read_header(filename: str) -> SaveHeader:
+    """Read only the header of a save file."""
+    import legacy_save
+
+    with open(filename, "rb") as f:
+        data = f.read(HEADER.size)
+    if legacy_save.is_old_save(data):
+        return read_sections(filename).header  # Old saves have no header, they're read whole.
+    header, _ = _decode_header(data)
+    return header
+
+
+def read_sections(filename: str) -> Sections:
+    """Read a save file, its sections are decoded as they're looked up.
+    Saves from before this format are converted, see legacy_save.
+    """
+    import legacy_save
+
+    with open(filename, "rb") as f:
+        data = bytearray(os.fstat(f.fileno()).st_size)
+        f.readinto(data)
+    if legacy_save.is_old_save(data):
+        return legacy_save.read_sections(bytes(data))
+    return decode(data)
+
+
+def decode(data: bytearray) -> Sections:
+    """Read the header and directory of a save."""
+    header, count = _decode_header(data)
+    directory = {}
+    for i in range(count):
+        name, codec, offset, length = DIRECTORY_ENTRY.unpack_from(
+            data, HEADER.size + DIRECTORY_ENTRY.size * i
+        )
+        directory[name.rstrip(b"\0").decode()] = codec.rstrip(b"\0").decode(), offset, length
+    return Sections(header, data, directory)
+
+
+def _decode_header(data: bytes) -> Tuple[SaveHeader, int]:
+    """Return the header of a save and its section count."""
+    if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a save file.")
+    _, version, count, checkpoint, *summary = HEADER.unpack_from(data)
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Save format {version} is newer than this game's ({FORMAT_VERSION}).")
+    if version < FORMAT_VERSION:
+        raise ValueError(f"Save format {version} is no longer supported.")
+    return SaveHeader(checkpoint.rstrip(b"\0").decode() or None, *summary), count
+
+
+def write_atomic(filename: str, data: bytes) -> None:
+    """Write a file through a temporary one, so a crash never leaves half a save behind."""
+    temporary = f"{filename}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, filename)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+
+
+def _encode_payload(codec: str, value: Any) -> bytes:
+    if callable(value):
+        value = value()
+    if isinstance(value, bytes):
+        return value
+    if codec in ("npy", "npy.z"):
+        stream = io.BytesIO()
+        np.save(stream, value, allow_pickle=False)
+        return stream.getvalue() if codec == "npy" else zlib.compress(stream.getvalue())
+    if codec == "json.z":
+        return zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+    if codec == "floor.z":
+        return pack_floor(value)
+    raise ValueError(f"Unknown codec {codec!r}.")
+
+
+def _decode_payload(codec: str, data: bytearray, offset: int, length: int) -> Any:
+    if codec == "npy":
+        # Only the header is parsed from a copy, the array itself is a view of the data.
+        header = io.BytesIO(data[offset:offset + min(length, 4096)])
+        major, _ = np.lib.format.read_magic(header)
+        if major == 1:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+        if dtype.hasobject:
+            raise ValueError("Save arrays can't hold objects.")
+        count = int(np.prod(shape))
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=offset + header.tell())
+        return array.reshape(shape, order="F" if fortran_order else "C")
+    if codec == "npy.z":
+        stream = io.BytesIO(zlib.decompress(data[offset:offset + length]))
+        return np.load(stream, allow_pickle=False)
+    if codec == "json.z":
+        return json.loads(zlib.decompress(data[offset:offset + length]))
+    if codec == "floor.z":
+        return unpack_floor(data[offset:offset + length])
+    raise ValueError(f"Unknown codec {codec!r}.")
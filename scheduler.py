@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import heapq
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from entity import Actor
+
+# An actor of speed NORMAL_SPEED acts once every ACTION_TIME time units.
+NORMAL_SPEED = 100
+ACTION_TIME = 100
+
+
+def action_delay(speed: int) -> int:
+    """Return the time an actor of `speed` waits between actions."""
+    return max(1, ACTION_TIME * NORMAL_SPEED // max(1, speed))
+
+
+class TurnScheduler:
+    """
+    A priority queue of actors keyed by the time of their next action.
+    Only scheduled actors cost anything, and the clock can jump straight to the next one due.
+    """
+
+    def __init__(self) -> None:
+        self.time = 0
+        self._heap: List[Tuple[int, int, Actor]] = []
+        # The sequence number of each actor's live heap entry, older entries are skipped when popped.
+        self._entries: Dict[Actor, int] = {}
+        self._next_sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, actor: Actor) -> bool:
+        return actor in self._entries
+
+    def schedule(self, actor: Actor, delay: int = 0) -> None:
+        """Schedule an actor to act `delay` time units from now, replacing any earlier entry."""
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        self._entries[actor] = sequence
+        heapq.heappush(self._heap, (self.time + delay, sequence, actor))
+
+    def unschedule(self, actor: Actor) -> None:
+        self._entries.pop(actor, None)
+
+    def entries(self) -> List[Tuple[int, Actor]]:
+        """Return the (time, actor) of every scheduled action, in the order they'll be popped."""
+        return [
+            (time, actor)
+            for time, sequence, actor in sorted(self._heap, key=lambda entry: entry[:2])
+            if self._entries.get(actor) == sequence
+        ]
+
+    def next_time(self) -> Optional[int]:
+        """Return the time of the next scheduled action, or None if nothing is scheduled."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, until: int) -> List[Actor]:
+        """Remove and return every actor due at the earliest scheduled time, if that is before
+        `until`, and move the clock to that time.  Returns an empty list once nothing is due.
+        """
+        due_time = self.next_time()
+        if due_time is None or due_time >= until:
+            return []
+        self.time = max(self.time, due_time)
+        actors = []
+        while self._heap and self._heap[0][0] == due_time:
+            _, sequence, actor = heapq.heappop(self._heap)
+            if self._entries.get(actor) == sequence:
+                del self._entries[actor]
+                actors.append(actor)
+        return actors
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
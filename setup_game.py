@@ -1,9 +1,6 @@
 """Handle the loading and initialization of game sessions."""
 from __future__ import annotations
 
-import copy
-import lzma
-import pickle
 import traceback
 from typing import Optional
 
@@ -14,6 +11,7 @@ from engine import Engine
 import entity_assemblyline
 from game_map import GameWorld
 import input_handlers
+import journal
 from procgen import generate_dungeon
 
 
@@ -21,16 +19,18 @@ from procgen import generate_dungeon
 background_image = tcod.image.load("menu_background.png")[:, :, :3]
 
 
-def new_game() -> Engine:
-    """Return a brand new game session as an Engine instance."""
-    map_width = 80
-    map_height = 43
-
+def new_game(
+    map_width: int = 80, map_height: int = 43, chunk_size: Optional[int] = None
+) -> Engine:
+    """Return a brand new game session as an Engine instance.
+    Maps bigger than the screen scroll to follow the player.  Give a `chunk_size` for maps too big
+    to hold whole, their arrays are then only allocated a chunk at a time as they're carved.
+    """
     room_max_size = 10
     room_min_size = 6
     max_rooms = 30
 
-    player = copy.deepcopy(entity_assemblyline.player)
+    player = entity_assemblyline.player.clone()
 
     engine = Engine(player=player)
 
@@ -41,9 +41,10 @@ def new_game() -> Engine:
         room_max_size=room_max_size,
         map_width=map_width,
         map_height=map_height,
+        chunk_size=chunk_size,
     )
 
-    engine.game_world.generate_floor()
+    engine.game_world.descend()
     engine.update_fov()
 
     engine.message_log.add_message(
@@ -53,16 +54,31 @@ def new_game() -> Engine:
 
 
 def load_game(filename: str) -> Engine:
-    """Load an Engine instance from a file."""
-    with open(filename, "rb") as f:
-        engine = pickle.loads(lzma.decompress(f.read()))
+    """Load an Engine instance from a file, with the turns in its journal replayed."""
+    engine = journal.load(filename)
     assert isinstance(engine, Engine)
+    engine.game_world.prefetch_floor(engine.game_world.current_floor + 1)
     return engine
 
 
+def describe_save(filename: str) -> Optional[str]:
+    """Describe the game saved in `filename` from its header, or return None if there is none."""
+    try:
+        header = journal.read_header(filename)
+    except (OSError, ValueError):
+        return None
+    return (
+        f"Dungeon level {header.floor}, character level {header.level}, "
+        f"HP {header.hp}/{header.max_hp}, turn {header.turns}"
+    )
+
+
 class MainMenu(input_handlers.BaseEventHandler):
     """Handle the main menu rendering and input."""
 
+    def __init__(self) -> None:
+        self.save_description = describe_save("savegame.sav")
+
     def on_render(self, console: tcod.Console) -> None:
         """Render the main menu on a background image."""
         console.draw_semigraphics(background_image, 0, 0)
@@ -96,6 +112,15 @@ class MainMenu(input_handlers.BaseEventHandler):
                 bg_blend=tcod.BKGND_ALPHA(64),
             )
 
+        if self.save_description:
+            console.print(
+                console.width // 2,
+                console.height // 2 + 2,
+                self.save_description,
+                fg=color.menu_text,
+                alignment=tcod.CENTER,
+            )
+
     def ev_keydown(
         self, event: tcod.event.KeyDown
     ) -> Optional[input_handlers.BaseEventHandler]:
@@ -103,14 +128,17 @@ class MainMenu(input_handlers.BaseEventHandler):
             raise SystemExit()
         elif event.sym == tcod.event.K_c:
             try:
-                return input_handlers.MainGameEventHandler(load_game("savegame.sav"))
+                engine = load_game("savegame.sav")
             except FileNotFoundError:
                 return input_handlers.PopUpMessage(self, "No saved game was found.")
             except Exception as exc:
                 traceback.print_exc()
                 return input_handlers.PopUpMessage(self, f"Failed to load save:\n{exc}")
-            pass
+            engine.journal = journal.Journal(engine, "savegame.sav")
+            return input_handlers.MainGameEventHandler(engine)
         elif event.sym == tcod.event.K_n:
-            return input_handlers.MainGameEventHandler(new_game())
+            engine = new_game()
+            engine.journal = journal.Journal(engine, "savegame.sav")
+            return input_handlers.MainGameEventHandler(engine)
 
         return None
\ No newline at end of file
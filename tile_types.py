@@ -1,6 +1,8 @@
-from typing import Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np #type: ignore
 
+from chunked_array import ChunkedArray
+
 #tile graphics constructor that plays nice with Console.tiles_rgb
 
 graphic_dt = np.dtype(
@@ -23,15 +25,153 @@ tile_dt = np.dtype(
 #FOW (Fog of War) represents any tiles we've never seen
 FOW = np.array((ord(" "), (255, 255, 255), (0,0,0)), dtype=graphic_dt)
 
+#maps store one uint8 tile id per cell. the palette holds the full tile_dt record for each id.
+palette = np.empty(0, dtype=tile_dt)
+
 def new_tile(
     *, #keyword enforcer. this allows us to create a new tile object without needing to worry about the order of the variables.
     walkable: int,
     transparent: int,
     unseen: Tuple[int, Tuple[int, int, int], Tuple[int, int, int]],
     seen: Tuple[int, Tuple[int, int, int], Tuple[int, int, int]],
-) -> np.ndarray:
-    #helper function for creation of new tile types
-    return np.array((walkable, transparent, unseen, seen), dtype=tile_dt)
+) -> int:
+    #helper function for creation of new tile types. registers the tile in the palette and returns its id.
+    global palette
+    palette = np.append(palette, np.array((walkable, transparent, unseen, seen), dtype=tile_dt))
+    assert len(palette) <= 256, "Tile ids are stored as uint8."
+    return len(palette) - 1
+
+
+# Past this many areas written to and not yet redrawn, they're merged into their bounding area.
+# Keeps a map that's written to but never rendered from piling them up.
+MAX_DIRTY_AREAS = 64
+
+
+class TileArray:
+    """
+    The tile ids of a map, either a dense uint8 array or a ChunkedArray of them.
+    Indexing with coordinates reads and writes tile ids.  Indexing with a tile_dt field name
+    ("walkable", "transparent", "seen", "unseen") returns that property for every tile,
+    looked up through the palette and cached until the map is thrown away.
+
+    Once `track_changes` is given a recipe which can rebuild the generated ids, every later write
+    is kept as a delta.  The ids can then be dropped, and aren't saved, since they can always be
+    rebuilt from the recipe with the deltas replayed over them.
+    """
+
+    def __init__(self, ids: Any):
+        self._ids = ids
+        self._shape: Tuple[int, int] = ids.shape
+        self.version = 0  # Bumped on every write, for caches built from the tiles.
+        self._properties: Dict[str, Any] = {}
+        self._dirty_areas: List[Tuple[int, int, int, int]] = []
+        # Something with a build_tile_ids() method, and the ids written since it built them.
+        self.recipe: Any = None
+        self.deltas: Optional[Dict[Tuple[int, int], int]] = None
+
+    @property
+    def ids(self) -> Any:
+        if self._ids is None:
+            self._ids = self._rebuild()
+        return self._ids
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._shape
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes held by the ids, nothing while they're dropped."""
+        return 0 if self._ids is None else self._ids.nbytes
+
+    @property
+    def properties_nbytes(self) -> int:
+        """The number of bytes held by the cached properties."""
+        return sum(values.nbytes for values in self._properties.values())
+
+    @property
+    def is_dropped(self) -> bool:
+        return self._ids is None
+
+    def track_changes(self, recipe: Any) -> None:
+        """Start keeping deltas against the ids `recipe` builds, which must match the current ids."""
+        self.recipe = recipe
+        self.deltas = {}
+
+    def drop(self) -> None:
+        """Free the ids and cached properties, they're rebuilt on the next access."""
+        assert self.recipe is not None, "Only tiles with a recipe can be rebuilt."
+        self._ids = None
+        self._properties = {}
+
+    def drop_properties(self) -> None:
+        """Free the cached properties, they're looked up again on the next access."""
+        self._properties = {}
+
+    def _rebuild(self) -> Any:
+        ids = self.recipe.build_tile_ids()
+        if self.deltas:
+            xs, ys = np.array(list(self.deltas)).T
+            ids[xs, ys] = np.array(list(self.deltas.values()), dtype=np.uint8)
+        return ids
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, str):
+            if key not in self._properties:
+                self._properties[key] = self._lookup(key)
+            return self._properties[key]
+        return self.ids[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.ids[key] = value
+        self.version += 1
+        self._dirty_areas.append(self._area_of(key))
+        if len(self._dirty_areas) > MAX_DIRTY_AREAS:
+            x1s, y1s, x2s, y2s = zip(*self._dirty_areas)
+            self._dirty_areas = [(min(x1s), min(y1s), max(x2s), max(y2s))]
+        # Patch the cached properties in place rather than rebuilding them.
+        for name, values in self._properties.items():
+            values[key] = palette[name][np.asarray(value)]
+        if self.deltas is not None:
+            self._record_deltas(key)
+
+    def _record_deltas(self, key: Any) -> None:
+        """Remember the new id of every tile a write touched."""
+        if isinstance(key, tuple) and any(isinstance(index, np.ndarray) for index in key):
+            xs, ys = np.broadcast_arrays(*key)
+        else:
+            x1, y1, x2, y2 = self._area_of(key)
+            xs, ys = np.mgrid[x1:x2, y1:y2]
+        xs, ys = xs.ravel(), ys.ravel()
+        for x, y, tile in zip(xs.tolist(), ys.tolist(), self.ids[xs, ys].tolist()):
+            self.deltas[x, y] = tile
+
+    def pop_dirty_areas(self) -> List[Tuple[int, int, int, int]]:
+        """Return the (x1, y1, x2, y2) areas written to since the last call, and forget them."""
+        areas, self._dirty_areas = self._dirty_areas, []
+        return areas
+
+    def _area_of(self, key: Any) -> Tuple[int, int, int, int]:
+        """Return the bounding (x1, y1, x2, y2) area of the tiles an index refers to."""
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        bounds = []
+        for index, length in zip(key, self.shape):
+            if isinstance(index, slice):
+                start, stop, _ = index.indices(length)
+                bounds.append((start, stop))
+            elif isinstance(index, np.ndarray):
+                bounds.append((int(index.min()), int(index.max()) + 1))
+            else:
+                bounds.append((int(index), int(index) + 1))
+        (x1, x2), (y1, y2) = bounds
+        return x1, y1, x2, y2
+
+    def _lookup(self, name: str) -> Any:
+        field = palette[name]
+        if isinstance(self.ids, ChunkedArray):
+            return self.ids.map_chunks(lambda ids: field[ids], field.dtype)
+        return np.asfortranarray(field[self.ids])
 
 """TYPES OF TILES"""
 floor = new_tile(
@@ -51,4 +191,10 @@ stairs_down = new_tile(
     transparent=True,
     unseen=(ord(">"), (100, 100, 100), (0, 0, 0)),
     seen=(ord(">"), (200, 200, 200), (0, 0, 0)),
-)
\ No newline at end of file
+)
+stairs_up = new_tile(
+    walkable=True,
+    transparent=True,
+    unseen=(ord("<"), (100, 100, 100), (0, 0, 0)),
+    seen=(ord("<"), (200, 200, 200), (0, 0, 0)),
+)